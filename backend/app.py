@@ -9,7 +9,12 @@ This backend provides REST API endpoints for:
 - Chemical data from PubChem database
 """
 
-from flask import Flask, request, jsonify, render_template
+from collections.abc import Mapping
+
+import orjson
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, url_for
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 
 # Import backend modules - handle both package and direct execution
@@ -18,13 +23,15 @@ try:
     from backend.reaction_engine import ReactionEngine
     from backend.database import Database
     from backend.pubchem_service import PubChemService
-    from backend.chemical_categorizer import ChemicalCategorizer
+    from backend.chemical_categorizer import ChemicalCategorizer, VALID_CATEGORIES
+    from backend.tasks import TaskQueue
 except ImportError:
     # When run directly from backend directory (local development)
     from reaction_engine import ReactionEngine
     from database import Database
     from pubchem_service import PubChemService
-    from chemical_categorizer import ChemicalCategorizer
+    from chemical_categorizer import ChemicalCategorizer, VALID_CATEGORIES
+    from tasks import TaskQueue
 
 # Initialize Flask app with frontend assets paths
 app = Flask(__name__,
@@ -32,15 +39,44 @@ app = Flask(__name__,
             template_folder='../frontend/templates')
 CORS(app)  # Enable Cross-Origin Resource Sharing for frontend requests
 
+# Compress JSON/HTML responses, preferring brotli; tiny bodies aren't worth the CPU
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 512
+app.config['COMPRESS_STREAMS'] = False  # Buffering to compress would hold back server-sent events
+Compress(app)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, so jsonify() and request.json use its C encoder/decoder."""
+
+    def dumps(self, obj, **kwargs):
+        # orjson encodes dataclasses (e.g. ReactionEntry) natively, field by
+        # field, without the deep copy dataclasses.asdict() would make
+        return orjson.dumps(obj, default=self._default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def _default(self, obj):
+        # Read-only mappings from the reaction rules serialize like dicts
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        return self.default(obj)
+
+
+app.json = ORJSONProvider(app)
+
 # Initialize core services
 engine = ReactionEngine()  # Handles reaction predictions
 db = Database()  # PostgreSQL database
 pubchem = PubChemService()  # PubChem API integration
 categorizer = ChemicalCategorizer()  # AI-based chemical categorization
+tasks = TaskQueue(db)  # Background runner for slow admin operations
 
 # Create database tables on startup
 try:
     db.create_tables()
+    db.load_known_cids()
 except Exception as e:
     print(f"Warning: Could not create database tables: {e}")
 
@@ -53,6 +89,14 @@ def get_chemicals():
     """
     Get all chemicals from database organized by category.
 
+    Query Parameters:
+        category (optional): Only return this category
+        limit (optional): Maximum number of chemicals to return
+        offset (optional): Number of chemicals to skip (default: 0)
+
+    Responses carry an ETag, so clients revalidating with If-None-Match
+    get a 304 Not Modified when the inventory hasn't changed.
+
     Returns:
         JSON: Dictionary with keys for each category (acids, bases, salts, etc.)
               Each category contains a list of chemical objects with:
@@ -64,9 +108,34 @@ def get_chemicals():
               - iupac_name: IUPAC name
               - smiles: SMILES notation
     """
+    category = request.args.get('category')
+
+    if category and category not in VALID_CATEGORIES:
+        return jsonify({
+            "error": f"Invalid category. Please use one of: {', '.join(sorted(VALID_CATEGORIES))}"
+        }), 400
+
+    # Parsed by hand: type=int would silently ignore values that aren't integers
     try:
-        chemicals = db.get_all_chemicals()
-        return jsonify(chemicals)
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        offset = int(request.args.get('offset', 0))
+        valid = offset >= 0 and (limit is None or limit >= 0)
+    except ValueError:
+        valid = False
+    if not valid:
+        return jsonify({
+            "error": "Invalid pagination. limit and offset must be non-negative integers."
+        }), 400
+
+    try:
+        if category or limit is not None or offset:
+            chemicals = db.get_chemicals(category=category, limit=limit, offset=offset)
+        else:
+            chemicals = db.get_all_chemicals()
+
+        response = jsonify(chemicals)
+        response.add_etag()
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error fetching chemicals: {e}")
         # Return empty categories if database is not available
@@ -93,42 +162,63 @@ def add_chemical():
         {"cid": 2244} - Search by PubChem CID (Compound ID)
 
     Returns:
+        202: Job queued - poll the returned status_url for the outcome
+        400: Invalid request (missing name or cid)
+
+    The job's result carries the status code of the outcome:
         201: Chemical successfully added
         200: Chemical already exists in database
-        400: Invalid request (missing name or cid)
         404: Chemical not found in PubChem database
         500: Server error during processing
 
-    The function:
+    The job:
     1. Fetches chemical data from PubChem API
     2. Checks if it already exists in the database
     3. Auto-categorizes the chemical using AI (acids, bases, salts, etc.)
     4. Stores it in PostgreSQL for future use
     """
-    data = request.json
+    data = request.json or {}
+
+    if 'cid' not in data and 'name' not in data:
+        return jsonify({
+            "error": "Please provide either a chemical name or PubChem ID"
+        }), 400
 
+    try:
+        job_id = tasks.enqueue('add-chemical', add_chemical_job, data)
+    except Exception as e:
+        print(f"Error adding chemical: {str(e)}")
+        return jsonify({
+            "error": "Unable to add chemical. Please try again later."
+        }), 500
+
+    return jsonify({
+        "message": "Adding chemical in the background",
+        "job_id": job_id,
+        "status_url": url_for('get_job', job_id=job_id)
+    }), 202
+
+
+def add_chemical_job(data):
+    """Background body of add_chemical. Returns (result, status_code)."""
     try:
         # Fetch from PubChem by CID or name
         if 'cid' in data:
             chem_data = pubchem.get_chemical_by_cid(data['cid'])
-        elif 'name' in data:
-            chem_data = pubchem.get_chemical_by_name(data['name'])
         else:
-            return jsonify({
-                "error": "Please provide either a chemical name or PubChem ID"
-            }), 400
+            chem_data = pubchem.get_chemical_by_name(data['name'])
 
         if not chem_data:
-            return jsonify({
+            return {
                 "error": "Chemical not found. Try searching with a different name or CID."
-            }), 404
+            }, 404
 
         # Check if already exists in database
         if db.chemical_exists(chem_data['cid']):
-            return jsonify({
+            return {
                 "message": "This chemical is already in the database",
                 "chemical": chem_data
-            }), 200
+            }, 200
 
         # Auto-categorize using LLM AI
         category = categorizer.categorize(
@@ -148,16 +238,16 @@ def add_chemical():
             smiles=chem_data.get('smiles')
         )
 
-        return jsonify({
+        return {
             "message": "Chemical added successfully!",
             "chemical": result
-        }), 201
+        }, 201
 
     except Exception as e:
         print(f"Error adding chemical: {str(e)}")
-        return jsonify({
+        return {
             "error": "Unable to add chemical. Please try again later."
-        }), 500
+        }, 500
 
 @app.route('/api/admin/search', methods=['GET'])
 def search_chemicals():
@@ -187,12 +277,8 @@ def search_chemicals():
         # Search PubChem for matching chemicals
         cids = pubchem.search_chemicals_by_keyword(keyword, max_results)
 
-        # Fetch details for each matching chemical
-        chemicals = []
-        for cid in cids[:10]:  # Limit to 10 to avoid API rate limits
-            chem_data = pubchem.get_chemical_by_cid(cid)
-            if chem_data:
-                chemicals.append(chem_data)
+        # Fetch details for the matching chemicals in one batched request
+        chemicals = pubchem.get_chemicals_by_cids(cids[:10])  # Limit to 10 to keep responses small
 
         return jsonify({
             "results": chemicals,
@@ -214,13 +300,16 @@ def discover_category(category):
         category: One of ['liquids', 'acids', 'bases', 'salts', 'indicators', 'solids', 'gases', 'ions']
 
     Returns:
-        JSON with discovery results:
+        202: Job queued - poll the returned status_url for the outcome
+        400: Invalid category
+
+    The job's result holds the discovery results:
         - message: Summary of the operation
         - added: Number of chemicals successfully added
         - skipped: Number of chemicals already in database
         - errors: List of any errors encountered
 
-    This endpoint:
+    The job:
     1. Searches PubChem for representative chemicals in the category
     2. Fetches detailed data for each found chemical
     3. Adds new ones to the database (skips duplicates)
@@ -228,60 +317,87 @@ def discover_category(category):
 
     Example: POST /api/admin/discover/acids
     """
-    valid_categories = ['liquids', 'acids', 'bases', 'salts', 'indicators', 'solids', 'gases', 'ions']
-    if category not in valid_categories:
+    if category not in VALID_CATEGORIES:
         return jsonify({
-            "error": f"Invalid category. Please use one of: {', '.join(valid_categories)}"
+            "error": f"Invalid category. Please use one of: {', '.join(sorted(VALID_CATEGORIES))}"
         }), 400
 
     try:
-        # Discover chemicals in this category from PubChem
-        cids = pubchem.discover_chemicals_by_category_keywords(category, max_per_keyword=3)
-
-        added_count = 0
-        skipped_count = 0
-        errors = []
-
-        # Process each discovered chemical
-        for cid in cids[:20]:  # Limit to 20 per discovery to avoid overwhelming the system
-            try:
-                # Skip if already in database
-                if db.chemical_exists(cid):
-                    skipped_count += 1
-                    continue
-
-                # Fetch chemical data from PubChem
-                chem_data = pubchem.get_chemical_by_cid(cid)
-                if not chem_data:
-                    continue
-
-                # Add to database (category is known)
-                db.add_chemical(
-                    cid=chem_data['cid'],
-                    name=chem_data['name'],
-                    formula=chem_data['formula'],
-                    molecular_weight=chem_data.get('molecular_weight'),
-                    category=category,
-                    iupac_name=chem_data.get('iupac_name'),
-                    smiles=chem_data.get('smiles')
-                )
-                added_count += 1
-
-            except Exception as e:
-                errors.append(f"CID {cid}: {str(e)}")
-
+        job_id = tasks.enqueue('discover', discover_category_job, category)
+    except Exception as e:
+        print(f"Error discovering chemicals: {str(e)}")
         return jsonify({
+            "error": "Could not discover chemicals. Please try again later."
+        }), 500
+
+    return jsonify({
+        "message": f"Discovering {category} in the background",
+        "job_id": job_id,
+        "status_url": url_for('get_job', job_id=job_id)
+    }), 202
+
+
+def discover_category_job(category):
+    """Background body of discover_category. Returns (result, status_code)."""
+    try:
+        # Discover chemicals in this category from PubChem
+        # Limit to 20 per discovery to avoid overwhelming the system
+        cids = pubchem.discover_chemicals_by_category_keywords(category, max_per_keyword=3)[:20]
+
+        # Skip chemicals already in the database (one query for all CIDs)
+        existing = db.filter_existing_cids(cids)
+        new_cids = [cid for cid in cids if cid not in existing]
+
+        # Fetch chemical data for all new CIDs in one batched PubChem request
+        rows = [
+            {
+                'cid': chem_data['cid'],
+                'name': chem_data['name'],
+                'formula': chem_data['formula'],
+                'molecular_weight': chem_data.get('molecular_weight'),
+                'category': category,  # Category is known
+                'iupac_name': chem_data.get('iupac_name'),
+                'smiles': chem_data.get('smiles')
+            }
+            for chem_data in pubchem.get_chemicals_by_cids(new_cids)
+        ]
+
+        # Add all new chemicals in a single insert, row by row if that fails
+        added_count, failures = db.add_chemicals_with_fallback(rows)
+        errors = [f"CID {row['cid']}: {str(e)}" for row, e in failures]
+
+        return {
             "message": f"Discovery complete for {category}!",
             "added": added_count,
-            "skipped": skipped_count,
+            "skipped": len(existing),
             "errors": errors
-        })
+        }, 200
 
     except Exception as e:
         print(f"Error discovering chemicals: {str(e)}")
-        return jsonify({
+        return {
             "error": "Could not discover chemicals. Please try again later."
-        }), 500
+        }, 500
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status of a background admin job.
+
+    URL Parameters:
+        job_id: ID returned by add-chemical or discover
+
+    Returns:
+        JSON with:
+        - status: queued, running, finished or failed
+        - status_code: HTTP status of the finished operation
+        - result: Response body of the finished operation
+        404 if the job doesn't exist
+    """
+    job = db.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 @app.route('/api/chemical-color/<name>', methods=['GET'])
 def get_chemical_color(name):
@@ -296,10 +412,14 @@ def get_chemical_color(name):
         - color: RGB color string (e.g., "#FF0000") or color name
 
     This helps students visualize what the mixture looks like in the beaker.
+    Colors are static, so browsers and CDNs may cache the response for a day.
     """
     try:
         color = engine.get_initial_color(name)
-        return jsonify({"color": color})
+        response = jsonify({"color": color})
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response
     except Exception as e:
         print(f"Error getting chemical color: {str(e)}")
         return jsonify({"color": "#ffffff"}), 200  # Default to white if color not found
@@ -360,6 +480,63 @@ def react():
         }), 500
 
 
+def _sse(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+
+@app.route('/api/react/stream', methods=['POST'])
+def react_stream():
+    """
+    Streaming version of /api/react using Server-Sent Events.
+
+    Takes the same request body as /api/react and emits:
+        event: rules        data: {...}            - rule-based result (no AI content yet)
+        event: explanation  data: {"text": "..."}  - next piece of the AI explanation as it is written
+        event: result       data: {...}            - the complete /api/react response
+        event: error        data: {"error": "..."}
+
+    The beaker can animate from the rules event right away, and the
+    explanation arrives while the model is still writing it, instead of
+    everything waiting for the whole answer to be generated.
+    """
+    try:
+        data = request.json
+        ingredients = data.get('ingredients', [])
+        temp = data.get('temperature', 'room')
+        conc = data.get('concentration', 'dilute')
+    except Exception as e:
+        print(f"Error reading reaction request: {str(e)}")
+        return jsonify({
+            "error": "Could not predict the reaction. Please try again."
+        }), 500
+
+    if not ingredients:
+        return jsonify({
+            "error": "Please add some chemicals first!"
+        }), 400
+
+    def generate():
+        try:
+            for kind, payload in engine.stream_reaction(ingredients, temperature=temp, concentration=conc):
+                if kind == "explanation":
+                    yield _sse("explanation", {"text": payload})
+                else:
+                    yield _sse(kind, payload)
+        except Exception as e:
+            print(f"Error streaming reaction: {str(e)}")
+            yield _sse("error", {"error": "Could not predict the reaction. Please try again."})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+        }
+    )
+
+
 @app.route('/api/explain', methods=['POST'])
 def explain():
     """
@@ -6,8 +6,10 @@ Switched to: Groq LLaMA 3.3 70B (open source, fast, accurate for categorization
 """
 
 import os
+import re
 import json
 import logging
+from string import Template
 from groq import Groq
 from dotenv import load_dotenv
 
@@ -16,8 +18,70 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# All inventory categories. The LLM chooses from every category except
+# 'liquids', which only holds hand-seeded solvents such as water.
+VALID_CATEGORIES = frozenset({'liquids', 'acids', 'bases', 'salts', 'indicators', 'solids', 'gases', 'ions'})
+_LLM_CATEGORIES = VALID_CATEGORIES - {'liquids'}
+
+# Name patterns that identify a category unambiguously, checked in order.
+# A match here is trusted without asking the LLM. Only names ending in "acid"
+# count, so e.g. "sodium acid pyrophosphate" or "Acid Red 87" still go to the LLM.
+_NAME_RULES = (
+    ('acids', re.compile(r'\bacid$|\bvinegar\b')),
+    ('bases', re.compile(r'\bhydroxide\b|\bammonia\b|\bsoda\b|carbonate\b')),
+    ('indicators', re.compile(r'\bindicator\b|phenolphthalein|litmus|bromothymol|\bmethyl (?:orange|red)\b')),
+    ('gases', re.compile(r'^(?:chlorine|hydrogen|oxygen|nitrogen|methane|propane|butane)$')),
+)
+
+# Charged species ("Hydroxide" is PubChem's title for OH-) may be ions rather
+# than the compound their name suggests, so the name rules leave them to the LLM
+_ION_NAME_RE = re.compile(r'\bions?\b')
+
+# Looser name keywords used by the offline fallback
+_ACID_NAMES = ('acid', 'vinegar')
+_BASE_NAMES = ('hydroxide', 'ammonia')
+_CARBONATE_NAMES = ('soda', 'carbonate')  # 'carbonate' also covers bicarbonate
+_INDICATOR_NAMES = ('indicator', 'phenolphthalein', 'litmus', 'methyl', 'bromothymol')
+# Matched as substrings of the name and exactly against the formula
+_GAS_KEYWORDS = (
+    'ammonia', 'chlorine', 'hydrogen', 'oxygen', 'nitrogen', 'methane', 'propane', 'butane',
+    'nh3', 'cl2', 'h2', 'o2', 'n2', 'ch4'
+)
+
+# Formula heuristics used by the offline fallback
+_ACID_FORMULA_RE = re.compile(r'^H.*(?:Cl|SO|NO|PO|CO)')  # Starts with H and has an acidic group
+_BASE_FORMULA_RE = re.compile(r'OH|^NH3$')  # Hydroxides and ammonia
+_METAL_SYMBOLS = frozenset({'zn', 'mg', 'fe', 'cu', 'al', 'na', 'ca'})
+
+# Reused for every categorization request
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a chemistry expert. Categorize chemicals accurately. Respond only with valid JSON."
+}
+
+_PROMPT_TEMPLATE = Template("""
+Categorize this chemical into ONE of these categories: acids, bases, salts, indicators, solids, gases, ions
+
+Chemical Information:
+- Name: $name
+- Formula: $formula
+$iupac_line
+
+Categories:
+- acids: Compounds that donate H+ ions (e.g., HCl, H2SO4, acetic acid)
+- bases: Compounds that accept H+ or donate OH- ions (e.g., NaOH, NH3, carbonates)
+- salts: Ionic compounds formed from neutralization (e.g., NaCl, CuSO4, AgNO3)
+- indicators: pH indicators that change color (e.g., phenolphthalein, litmus, methyl orange)
+- solids: Pure elemental metals (e.g., Zn, Mg, Fe, Cu, Al)
+- gases: Gaseous substances at room temperature (e.g., NH3, Cl2, H2, O2)
+- ions: Individual charged species (e.g., CO3^2-, I-, Co2+, NH4+, Cl-)
+
+Respond in JSON format:
+{"category": "acids|bases|salts|indicators|solids|gases|ions"}
+""")
+
 class ChemicalCategorizer:
-    """LLM-based chemical categorization service using Groq."""
+    """Chemical categorization service: name rules first, Groq LLM for the rest."""
 
     def __init__(self):
         self.api_key = os.getenv("GROQ_API_KEY")
@@ -38,9 +102,17 @@ class ChemicalCategorizer:
             formula: Molecular formula
             iupac_name: IUPAC name (optional)
 
+        Names matching a high-confidence rule are categorized locally;
+        only the remaining chemicals are sent to the LLM.
+
         Returns:
             str: Category (acids, bases, salts, indicators, solids)
         """
+        # Clear-cut names (e.g. "... acid", "... hydroxide") don't need an LLM round-trip
+        category = self._match_name_rules(name, formula)
+        if category:
+            return category
+
         if not self.client:
             return self._fallback_categorize(name, formula)
 
@@ -50,17 +122,14 @@ class ChemicalCategorizer:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a chemistry expert. Categorize chemicals accurately. Respond only with valid JSON."
-                    },
+                    _SYSTEM_MESSAGE,
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
                 temperature=0.3,
-                max_tokens=1000,
+                max_tokens=50,  # The answer is a single short JSON object
                 response_format={"type": "json_object"}
             )
 
@@ -68,8 +137,7 @@ class ChemicalCategorizer:
             category = content.get("category", "salts").lower()
             
             # Validate category
-            valid_categories = ['acids', 'bases', 'salts', 'indicators', 'solids', 'gases', 'ions']
-            if category not in valid_categories:
+            if category not in _LLM_CATEGORIES:
                 logger.warning(f"Invalid category '{category}' for {name}, using fallback")
                 return self._fallback_categorize(name, formula)
             
@@ -80,66 +148,59 @@ class ChemicalCategorizer:
             logger.error(f"Error categorizing {name}: {e}")
             return self._fallback_categorize(name, formula)
     
+    def _match_name_rules(self, name, formula):
+        """Return the category for names matching a high-confidence rule, else None."""
+        name_lower = name.lower().strip()
+        if _ION_NAME_RE.search(name_lower) or (formula and ('+' in formula or '-' in formula)):
+            return None
+        for category, pattern in _NAME_RULES:
+            if pattern.search(name_lower):
+                return category
+        return None
+
     def _build_prompt(self, name, formula, iupac_name):
         """Build the LLM prompt for categorization."""
-        return f"""
-Categorize this chemical into ONE of these categories: acids, bases, salts, indicators, solids, gases, ions
-
-Chemical Information:
-- Name: {name}
-- Formula: {formula}
-{f'- IUPAC Name: {iupac_name}' if iupac_name else ''}
-
-Categories:
-- acids: Compounds that donate H+ ions (e.g., HCl, H2SO4, acetic acid)
-- bases: Compounds that accept H+ or donate OH- ions (e.g., NaOH, NH3, carbonates)
-- salts: Ionic compounds formed from neutralization (e.g., NaCl, CuSO4, AgNO3)
-- indicators: pH indicators that change color (e.g., phenolphthalein, litmus, methyl orange)
-- solids: Pure elemental metals (e.g., Zn, Mg, Fe, Cu, Al)
-- gases: Gaseous substances at room temperature (e.g., NH3, Cl2, H2, O2)
-- ions: Individual charged species (e.g., CO3^2-, I-, Co2+, NH4+, Cl-)
-
-Respond in JSON format:
-{{"category": "acids|bases|salts|indicators|solids|gases|ions", "reasoning": "brief explanation"}}
-"""
+        return _PROMPT_TEMPLATE.substitute(
+            name=name,
+            formula=formula,
+            iupac_line=f'- IUPAC Name: {iupac_name}' if iupac_name else ''
+        )
     
     def _fallback_categorize(self, name, formula):
         """Fallback categorization based on simple rules."""
         name_lower = name.lower()
-        formula_lower = formula.lower() if formula else ""
-        
-        # Check for acids
-        if any(acid in name_lower for acid in ['acid', 'vinegar']):
+        formula = formula or ""
+        formula_lower = formula.lower()
+
+        # Acids
+        if any(keyword in name_lower for keyword in _ACID_NAMES):
             return 'acids'
-        if formula and (formula.startswith('H') and any(x in formula for x in ['Cl', 'SO', 'NO', 'PO', 'CO'])):
+        if _ACID_FORMULA_RE.match(formula):
             return 'acids'
-        
-        # Check for bases
-        if 'hydroxide' in name_lower or 'ammonia' in name_lower:
+
+        # Bases
+        if any(keyword in name_lower for keyword in _BASE_NAMES):
             return 'bases'
-        if formula and ('OH' in formula or formula == 'NH3'):
+        if _BASE_FORMULA_RE.search(formula):
             return 'bases'
-        if any(base in name_lower for base in ['soda', 'carbonate', 'bicarbonate']):
+        if any(keyword in name_lower for keyword in _CARBONATE_NAMES):
             return 'bases'
-        
-        # Check for indicators
-        if any(ind in name_lower for ind in ['indicator', 'phenolphthalein', 'litmus', 'methyl', 'bromothymol']):
+
+        # Indicators
+        if any(keyword in name_lower for keyword in _INDICATOR_NAMES):
             return 'indicators'
-        
-        # Check for pure metals (solids)
-        metals = ['zinc', 'magnesium', 'iron', 'copper', 'aluminum', 'sodium', 'calcium', 'zn', 'mg', 'fe', 'cu', 'al', 'na', 'ca']
-        if formula and len(formula) <= 3 and formula.isalpha():
-            if any(metal == formula_lower for metal in metals):
-                return 'solids'
-        
-        # Check for gases
-        gases = ['ammonia', 'chlorine', 'hydrogen', 'oxygen', 'nitrogen', 'methane', 'propane', 'butane', 'nh3', 'cl2', 'h2', 'o2', 'n2', 'ch4']
-        if any(gas in name_lower for gas in gases) or any(gas == formula_lower for gas in gases):
+
+        # Pure metals (solids)
+        if formula_lower in _METAL_SYMBOLS:
+            return 'solids'
+
+        # Gases
+        if any(gas in name_lower for gas in _GAS_KEYWORDS) or formula_lower in _GAS_KEYWORDS:
             return 'gases'
-            
-        # Check for ions
-        if 'ion' in name_lower or any(c in formula for c in ['+', '-']) if formula else False:
+
+        # Ions (only judged when there is a formula; names alone default to salts)
+        if formula and ('ion' in name_lower or '+' in formula or '-' in formula):
             return 'ions'
-            
+
         # Default to salts
         return 'salts'
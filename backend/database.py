@@ -2,11 +2,14 @@
 Database configuration and models for chemical storage.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import create_engine, func, insert, select, Column, Integer, String, Float, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,10 +31,12 @@ class Chemical(Base):
     name = Column(String(255), nullable=False)
     formula = Column(String(100))
     molecular_weight = Column(Float)
-    category = Column(String(50))  # liquids, acids, bases, salts, indicators, solids, gases, ions
+    category = Column(String(50), index=True)  # liquids, acids, bases, salts, indicators, solids, gases, ions
     iupac_name = Column(Text)
     smiles = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Stamped in Python too: create_all doesn't add the server default to
+    # tables created before it existed, which would otherwise store NULL
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization."""
@@ -47,79 +52,276 @@ class Chemical(Base):
             'display': format_formula(self.formula, self.name)
         }
 
+# Columns returned by inventory listings, fetched as plain rows rather than
+# ORM objects (no identity map or attribute instrumentation per row)
+_LISTING_COLUMNS = (
+    Chemical.id,
+    Chemical.cid,
+    Chemical.name,
+    Chemical.formula,
+    Chemical.molecular_weight,
+    Chemical.category,
+    Chemical.iupac_name,
+    Chemical.smiles
+)
+
+class Job(Base):
+    """Background admin job (add-chemical, discover) and its outcome."""
+    __tablename__ = 'jobs'
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, finished, failed
+    status_code = Column(Integer)  # HTTP status the synchronous endpoint would have returned
+    result = Column(Text)  # JSON-encoded response body
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'status_code': self.status_code,
+            'result': json.loads(self.result) if self.result else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Database:
     """Database connection and operations manager."""
+
+    # Other worker processes may add chemicals too, so the cached inventory
+    # is also refreshed periodically, not only when this process adds one
+    ALL_CHEMICALS_CACHE_TTL = 60  # seconds
     
     def __init__(self):
         # Use environment variable or default to local PostgreSQL
         db_url = os.getenv('DATABASE_URL')
-        self.engine = create_engine(db_url)
-        self.Session = sessionmaker(bind=self.engine)
+
+        # Keep a pool of warm connections per worker process so concurrent
+        # requests don't queue on a single connection or reconnect each time
+        pool_options = {}
+        if not db_url.startswith('sqlite'):
+            pool_options = {
+                'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+                'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+                'pool_pre_ping': True,  # Transparently replace connections dropped by the server
+                'pool_recycle': 1800,
+                # TCP keepalives stop idle pooled connections from being silently dropped
+                'connect_args': {'keepalives': 1, 'keepalives_idle': 60}
+            }
+
+        self.engine = create_engine(db_url, **pool_options)
+        # Objects stay readable after commit without a refresh SELECT; rows are
+        # only ever changed through these short-lived sessions
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+        # CIDs known to be stored. Chemicals are never deleted, so a hit is
+        # definitive; a miss falls through to SQL because another worker
+        # process may have inserted the chemical since.
+        self._known_cids = set()
+
+        # Cached get_all_chemicals() result, dropped whenever a chemical is added
+        self._all_cache = None
+        self._all_cache_expires_at = 0.0
+        self._all_cache_generation = 0
+        self._all_cache_lock = threading.Lock()
     
     def create_tables(self):
         """Create all tables in the database."""
         Base.metadata.create_all(self.engine)
+        # create_all skips tables that already exist, so add indexes introduced later
+        for index in Chemical.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
     
+    def load_known_cids(self):
+        """Prime the known-CID set from the database (call once at startup)."""
+        with self.get_session() as session:
+            self._known_cids.update(cid for (cid,) in session.query(Chemical.cid))
+
     def get_session(self):
         """Get a new database session."""
         return self.Session()
+
+    def transaction(self):
+        """
+        Context manager for a unit of work: checks a connection out of the pool,
+        commits on success, rolls back on error and always returns the connection.
+        """
+        return self.Session.begin()
     
     def add_chemical(self, cid, name, formula, molecular_weight, category, iupac_name=None, smiles=None):
         """Add a chemical to the database."""
-        session = self.get_session()
-        try:
-            chemical = Chemical(
-                cid=cid,
-                name=name,
-                formula=formula,
-                molecular_weight=molecular_weight,
-                category=category,
-                iupac_name=iupac_name,
-                smiles=smiles
-            )
-            session.add(chemical)
-            session.commit()
-            return chemical.to_dict()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
+        row = {
+            'cid': cid,
+            'name': name,
+            'formula': formula,
+            'molecular_weight': molecular_weight,
+            'category': category,
+            'iupac_name': iupac_name,
+            'smiles': smiles
+        }
+        with self.transaction() as session:
+            # Same Core INSERT as add_chemicals_bulk, returning the new ID
+            # instead of building and flushing an ORM object
+            chemical_id = session.execute(insert(Chemical).returning(Chemical.id), row).scalar_one()
+        self._known_cids.add(cid)
+        self._invalidate_all_cache()
+        return {'id': chemical_id, **row, 'display': format_formula(formula, name)}
     
-    def get_all_chemicals(self):
-        """Get all chemicals grouped by category."""
-        session = self.get_session()
+    def add_chemicals_bulk(self, rows):
+        """
+        Add several chemicals in a single transaction.
+        rows: list of dicts with the same keys as add_chemical's arguments
+        """
+        if not rows:
+            return 0
+
+        with self.transaction() as session:
+            # One executemany round-trip instead of an INSERT + COMMIT per row
+            session.execute(insert(Chemical), rows)
+        self._known_cids.update(row['cid'] for row in rows)
+        self._invalidate_all_cache()
+        return len(rows)
+
+    def add_chemicals_with_fallback(self, rows):
+        """
+        Add several chemicals with one bulk insert; if that fails, retry them
+        one at a time so a single bad row (e.g. a CID another worker just
+        inserted) doesn't sink the rest.
+
+        Returns:
+            tuple: (number of rows added, [(row, exception) for each row that failed])
+        """
         try:
-            chemicals = session.query(Chemical).all()
-
-            # Group by category
-            grouped = {
-                'liquids': [],
-                'acids': [],
-                'bases': [],
-                'salts': [],
-                'indicators': [],
-                'solids': [],
-                'gases': [],
-                'ions': []
-            }
+            return self.add_chemicals_bulk(rows), []
+        except Exception:
+            pass
+
+        added = 0
+        failures = []
+        for row in rows:
+            try:
+                added += self.add_chemicals_bulk([row])
+            except Exception as e:
+                failures.append((row, e))
+        return added, failures
+
+    def get_all_chemicals(self):
+        """Get all chemicals grouped by category (cached; see ALL_CHEMICALS_CACHE_TTL)."""
+        with self._all_cache_lock:
+            if self._all_cache is not None and time.monotonic() < self._all_cache_expires_at:
+                return self._all_cache
+            generation = self._all_cache_generation
+
+        data = self.get_chemicals()
+        with self._all_cache_lock:
+            # Don't store a result that an add made stale while we were querying
+            if generation == self._all_cache_generation:
+                self._all_cache = data
+                self._all_cache_expires_at = time.monotonic() + self.ALL_CHEMICALS_CACHE_TTL
+        return data
+
+    def _invalidate_all_cache(self):
+        """Drop the cached inventory so the next read goes to the database."""
+        with self._all_cache_lock:
+            self._all_cache = None
+            self._all_cache_generation += 1
+
+    def get_chemicals(self, category=None, limit=None, offset=0):
+        """
+        Get chemicals grouped by category, optionally filtered and paginated.
 
-            for chem in chemicals:
-                if chem.category in grouped:
-                    grouped[chem.category].append(chem.to_dict())
+        Args:
+            category: Only return this category (the result then has a single key)
+            limit: Maximum number of chemicals to return
+            offset: Number of chemicals to skip (ordered by ID)
+        """
+        query = select(*_LISTING_COLUMNS)
+        if category:
+            query = query.where(Chemical.category == category)
+        query = query.order_by(Chemical.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
 
-            return grouped
-        finally:
-            session.close()
+        with self.get_session() as session:
+            rows = session.execute(query).all()
+
+        # Group by category
+        grouped = {
+            'liquids': [],
+            'acids': [],
+            'bases': [],
+            'salts': [],
+            'indicators': [],
+            'solids': [],
+            'gases': [],
+            'ions': []
+        }
+        if category:
+            grouped = {category: []}
+
+        for row in rows:
+            group = grouped.get(row.category)
+            if group is not None:
+                chem = dict(row._mapping)
+                chem['display'] = format_formula(row.formula, row.name)
+                group.append(chem)
+
+        return grouped
     
     def get_chemical_by_cid(self, cid):
         """Get a chemical by PubChem CID."""
-        session = self.get_session()
-        try:
+        with self.get_session() as session:
             return session.query(Chemical).filter_by(cid=cid).first()
-        finally:
-            session.close()
     
     def chemical_exists(self, cid):
         """Check if a chemical already exists in database."""
-        return self.get_chemical_by_cid(cid) is not None
+        if cid in self._known_cids:
+            return True
+        with self.get_session() as session:
+            # SELECT 1 ... LIMIT 1 instead of loading the whole row as an ORM object
+            exists = session.execute(
+                select(1).where(Chemical.cid == cid).limit(1)
+            ).scalar() is not None
+        if exists:
+            self._known_cids.add(cid)
+        return exists
+
+    def filter_existing_cids(self, cids):
+        """Return the subset of the given CIDs that are already in the database."""
+        existing = {cid for cid in cids if cid in self._known_cids}
+        unknown = [cid for cid in cids if cid not in existing]
+        if not unknown:
+            return existing
+
+        with self.get_session() as session:
+            rows = session.query(Chemical.cid).filter(Chemical.cid.in_(unknown)).all()
+        found = {row.cid for row in rows}
+        self._known_cids.update(found)
+        return existing | found
+
+    def create_job(self, job_id, kind):
+        """Record a newly queued background job."""
+        with self.transaction() as session:
+            session.add(Job(id=job_id, kind=kind, status='queued'))
+
+    def update_job(self, job_id, status, status_code=None, result=None):
+        """Update a background job's status and, once done, its result."""
+        with self.transaction() as session:
+            job = session.get(Job, job_id)
+            if job is None:
+                return
+            job.status = status
+            if status_code is not None:
+                job.status_code = status_code
+            if result is not None:
+                job.result = json.dumps(result)
+
+    def get_job(self, job_id):
+        """Get a background job as a dict, or None if it doesn't exist."""
+        with self.get_session() as session:
+            job = session.get(Job, job_id)
+            return job.to_dict() if job else None
@@ -3,6 +3,8 @@ Utility to format chemical formulas from Hill System (alphabetical) notation
 to common laboratory chemical notation.
 """
 
+from functools import lru_cache
+
 COMMON_MAP = {
     "ClH": "HCl",
     "H2O4S": "H2SO4",
@@ -25,17 +27,27 @@ COMMON_MAP = {
     "O3S": "SO3",
 }
 
+# Formulas already in common notation, returned unchanged
+_CANONICAL = frozenset(COMMON_MAP.values())
+
+@lru_cache(maxsize=4096)
 def format_formula(formula, name=""):
     """
     Converts a Hill System formula to a common representation.
     If name is provided, can be used for more specific mapping.
+    Results are cached, since the inventory repeats the same formulas on every request.
     """
     if not formula:
         return name or "Unknown"
         
     # Check specific map
-    if formula in COMMON_MAP:
-        return COMMON_MAP[formula]
+    mapped = COMMON_MAP.get(formula)
+    if mapped is not None:
+        return mapped
+
+    # Skip the Hill-order heuristic below, which would also turn e.g. NaOH into HNaO
+    if formula in _CANONICAL:
+        return formula
         
     # Handle simple acids (binary) - Hill puts H first unless C is present
     # But for HCl, Hill puts Cl first (ClH).
@@ -6,9 +6,16 @@ Now uses: Groq LLaMA 3.3 70B (fast, accurate, generous free tier, good chemistry
 """
 
 import os
-import json
+import re
 import logging
-from groq import Groq
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from types import MappingProxyType
+import httpx
+import orjson
+from groq import DefaultHttpxClient, Groq
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,6 +23,274 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_PROMPT_PREAMBLE = "You are an expert chemistry education assistant. Provide comprehensive, detailed explanations suitable for high school and early college students."
+
+_PROMPT_GUIDANCE = """Before answering, verify whether these chemicals ACTUALLY react under the given conditions (reactivity series, solubility rules, acid-base theory) and whether heat, concentration or a catalyst is required. If they don't react, say so clearly and explain why.
+
+Explain what happens: whether they react or just mix, what goes on at the molecular/ionic level and why, the role of concentration and temperature, what students should observe, and how it relates to broader chemistry concepts. Use correct terminology, explain the WHY, and never invent visual effects that won't happen."""
+
+_PROMPT_INSTRUCTIONS = _PROMPT_GUIDANCE + "\n\nRespond only by calling the provided function."
+
+# Everything that is the same on every call goes in the system message, so
+# requests share one identical prompt prefix that Groq can cache; only the
+# short REACTION DATA block in the user message changes
+_SYSTEM_PROMPT = f"""{_PROMPT_PREAMBLE}
+
+{_PROMPT_INSTRUCTIONS}"""
+
+# Reused for every explanation request
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": _SYSTEM_PROMPT
+}
+
+# Structured output: the model fills in these arguments through a forced
+# function call instead of imitating a JSON example written into the prompt
+_CONTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanation": {"type": "string", "description": "Comprehensive explanation (4-6 sentences). FIRST state if reaction occurs or not. Then explain WHAT happens, WHY at the molecular/ionic level, discuss conditions and observable changes. Be accurate about chemistry."},
+        "safety_tips": {"type": "string", "description": "Specific, practical safety precautions for these chemicals (2-3 sentences). Explain what hazards exist and what protective measures are needed."},
+        "concept": {"type": "string", "description": "The chemistry concept name and a detailed description (2-3 sentences). Explain what type of reaction this is, why it's classified that way, and what makes it significant. Example format: 'Redox Reaction - A reaction involving transfer of electrons between reactants, where one substance is oxidized and another is reduced, causing change in oxidation states.'"},
+        "real_world_example": {"type": "string", "description": "A detailed practical application (2-3 sentences). Explain how and why this reaction is used in industry, medicine, or everyday life, and what makes it important."},
+        "bubbles": {"type": "boolean", "description": "true ONLY if gas is produced - H₂, CO₂, O₂, etc."},
+        "precipitate": {"type": "boolean", "description": "true ONLY if insoluble solid forms"},
+        "heat": {"type": "boolean", "description": "true ONLY if reaction is exothermic and releases noticeable heat"},
+        "gas_smoke": {"type": "boolean", "description": "true if visible gas/smoke/vapor is produced - like NO₂ brown gas, Cl₂ yellow-green gas, SO₂, NH₃ vapor, etc."},
+        "color_change": {"type": ["string", "null"], "description": "hex color like #FF0000 or null (final solution color if changed)"},
+        "equation": {"type": "string", "description": "the balanced chemical equation (or 'No Reaction' if chemicals don't react)"}
+    },
+    "required": ["explanation", "safety_tips", "concept", "real_world_example", "bubbles", "precipitate", "heat", "gas_smoke", "color_change", "equation"]
+}
+
+# Streamed answers come back as plain message content, which arrives token
+# by token; a forced function call's arguments may only arrive in one piece.
+# Asking for "explanation" first lets it be shown while the rest is written.
+_STREAM_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": f"""{_PROMPT_PREAMBLE}
+
+{_PROMPT_GUIDANCE}
+
+Respond with only a JSON object, starting with the "explanation" field, that follows this JSON schema:
+{orjson.dumps(_CONTENT_SCHEMA).decode()}"""
+}
+
+_CONTENT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_reaction_content",
+        "description": "Return the educational content for the reaction.",
+        "parameters": _CONTENT_SCHEMA
+    }
+}
+
+_BATCH_CONTENT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_batch_content",
+        "description": "Return the educational content for every reaction, one result per reaction.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "idx": {"type": "integer", "description": "REACTION number this result is for"},
+                            **_CONTENT_SCHEMA["properties"]
+                        },
+                        "required": ["idx", *_CONTENT_SCHEMA["required"]]
+                    }
+                }
+            },
+            "required": ["results"]
+        }
+    }
+}
+
+
+def _tool_choice(tool):
+    """tool_choice value forcing the model to call the given tool."""
+    return {"type": "function", "function": {"name": tool["function"]["name"]}}
+
+
+# Per-reaction lines of the prompt; only these fields change between calls
+_REACTION_DATA_TEMPLATE = """- Initial Ingredients: {ingredients}
+- Chemical Equation: {equation}
+- Reaction Type: {reaction_type}
+- Conditions: Temperature = {temperature}, Concentration = {concentration}{history}
+- Observable Effects: {visual_effects}
+- Final pH: {ph_value}"""
+
+# User message for a single reaction, filled in with one format() call
+_PROMPT_TEMPLATE = "REACTION DATA:\n" + _REACTION_DATA_TEMPLATE
+
+
+# Canned educational content per reaction type for when Groq is unavailable.
+# Built once at import and shared read-only by every fallback response.
+_FALLBACK_MAP = MappingProxyType({
+    "neutralization": {
+        "explanation": "In a neutralization reaction, an acid (H+ donor) reacts with a base (OH- donor) to form salt and water. The H+ ions from the acid combine with OH- ions from the base, producing water and ionic salts. The solution becomes less acidic or basic, approaching neutral pH 7, and typically releases heat energy (exothermic). This is a fundamental acid-base reaction in chemistry.",
+        "safety_tips": "Always add acid to base slowly (never the reverse) to prevent violent reactions and splashing. Wear goggles and gloves. If you spill acid or base, neutralize with the opposite substance before cleanup. Use proper ventilation.",
+        "concept": "Acid-Base Neutralization Reaction - An exothermic reaction where hydrogen ions (H+) from an acid combine with hydroxide ions (OH-) from a base to form water and a salt. This balances pH and is essential in chemistry and industry.",
+        "real_world_example": "Antacids (like calcium carbonate or sodium bicarbonate) neutralize excess stomach acid to relieve heartburn. Industrial acid-base neutralization is used in water treatment to adjust pH levels in drinking water and wastewater."
+    },
+    "single_displacement": {
+        "explanation": "In a displacement reaction, a more reactive element replaces a less reactive element in a compound. The reactivity of metals follows a predictable order - more reactive metals can displace less reactive metals from their salts or acids. This occurs because the more reactive metal has a stronger tendency to lose electrons and form positive ions, driving the reaction forward.",
+        "safety_tips": "Handle reactive metals carefully as they can react violently with water or acid. Never touch reactive metals with bare hands. Dispose of metal salts and unreacted metals according to chemical waste guidelines. Work in a well-ventilated area or fume hood.",
+        "concept": "Single Displacement (Substitution) Reaction - A reaction where a more reactive element displaces a less reactive element from a compound, based on relative reactivity. This demonstrates the electrochemical series and electron transfer principles in redox reactions.",
+        "real_world_example": "The extraction of pure metals from ores uses displacement principles - for example, carbon displaces metals from their oxides in industrial smelting. Galvanizing (coating steel with zinc) protects against rust through displacement chemistry. Cathodic protection in pipelines uses similar displacement principles."
+    },
+    "precipitation": {
+        "explanation": "A precipitation reaction occurs when two soluble ionic compounds combine to form an insoluble solid (precipitate) that separates from the solution. The insoluble product forms because the ions have reduced solubility when combined, exceeding the solubility product constant. The precipitate settles out as a distinct solid phase, while the solution retains dissolved ions.",
+        "safety_tips": "Avoid skin contact with precipitates as some are toxic. Use appropriate gloves and eye protection. Some precipitates (like barium sulfate) are harmless, while others require careful disposal. Always wash hands after handling and dispose of chemical waste in designated containers.",
+        "concept": "Precipitation Reaction - A reaction between soluble ionic compounds that produces an insoluble solid (precipitate) when ions combine. The driving force is the formation of a compound with low solubility, and these reactions are essential for analytical chemistry and industrial processes.",
+        "real_world_example": "Water treatment plants use precipitation reactions to remove hardness (calcium and magnesium ions) and contaminating ions. In analytical chemistry, precipitation is used to identify and quantify specific ions. Photography and pharmaceutical manufacturing rely on precipitation for product purification."
+    },
+    "redox": {
+        "explanation": "A redox (reduction-oxidation) reaction involves the transfer of electrons between reactants. One reactant is oxidized (loses electrons) while another is reduced (gains electrons). Oxidation states change as electrons transfer, and the number of electrons lost must equal the number gained. These reactions release or absorb energy depending on whether bonds are broken or formed.",
+        "safety_tips": "Many redox reactions are vigorous and can release significant heat or gases. Ensure proper ventilation, use appropriate glassware, and never mix incompatible oxidizing and reducing agents. Always follow proper chemical handling procedures and safety guidelines.",
+        "concept": "Redox (Oxidation-Reduction) Reaction - A reaction where electrons are transferred from one reactant (reducing agent) to another (oxidizing agent), causing changes in oxidation states. These reactions are fundamental to chemistry, including combustion, corrosion, and photosynthesis.",
+        "real_world_example": "Combustion reactions are redox reactions that power engines and generate electricity. Cellular respiration (oxidizing glucose) provides energy for all living organisms. Batteries and fuel cells operate through controlled redox reactions to generate electrical energy."
+    }
+})
+
+_DEFAULT_FALLBACK = MappingProxyType({
+    "explanation": "These substances are being mixed together. Observe any changes in color, temperature, physical state, or other properties. Even if no obvious reaction occurs, molecular interactions may be happening at the particulate level that aren't easily visible.",
+    "safety_tips": "Always wear appropriate personal protective equipment (goggles, gloves, lab coat). Work in a well-ventilated area. Read safety data sheets for all chemicals before handling. Know the location of emergency equipment.",
+    "concept": "Chemical Mixture or Interaction - A combination of substances that may or may not undergo observable chemical changes. Understanding interactions between substances is fundamental to chemistry.",
+    "real_world_example": "Understanding how different chemicals interact is essential in pharmacy, food science, environmental remediation, and countless industrial processes where controlled mixing produces desired products."
+})
+
+
+def _decode_partial_string(text, start):
+    """
+    Decode the JSON string whose body begins at text[start] (just past the
+    opening quote), as far as it has arrived.
+
+    Returns (value, complete); value is None if what has arrived can't be
+    decoded yet (e.g. only the first half of a surrogate pair).
+    """
+    i = start
+    complete = False
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            complete = True
+            break
+        if c == '\\':
+            # Hold back an escape (\n, \uXXXX) until all of it has arrived
+            length = 6 if text[i + 1:i + 2] == 'u' else 2
+            if i + length > len(text):
+                break
+            i += length
+        else:
+            i += 1
+
+    try:
+        return orjson.loads('"' + text[start:i] + '"'), complete
+    except orjson.JSONDecodeError:
+        return None, False
+
+
+def _json_object(text):
+    """The outermost {...} in a model's reply, without any surrounding prose or code fence."""
+    start = text.find("{")
+    end = text.rfind("}")
+    return text[start:end + 1] if start != -1 and end > start else text
+
+
+class _FieldStreamer:
+    """
+    Follows one top-level string field of a JSON object that arrives in
+    fragments, returning each newly arrived piece of its text.
+    """
+
+    def __init__(self, field):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.text = ""  # Everything fed so far
+        self._start = None  # Index of the field's first character, once seen
+        self._sent = 0  # Characters of the value already returned
+        self._complete = False
+
+    def feed(self, fragment):
+        """Add a fragment and return the field text it completed ("" if none)."""
+        self.text += fragment
+        if self._complete:
+            return ""
+        if self._start is None:
+            match = self._key.search(self.text)
+            if not match:
+                return ""
+            self._start = match.end()
+
+        value, self._complete = _decode_partial_string(self.text, self._start)
+        if value is None or len(value) <= self._sent:
+            return ""
+        piece = value[self._sent:]
+        self._sent = len(value)
+        return piece
+
+
+class _MicroBatcher:
+    """
+    Groups calls that arrive within a short window into one batch call.
+
+    The first caller in a window waits for the window to close, runs the
+    whole batch and hands each waiting caller its own result. A batch that
+    reaches max_batch calls is run straight away by the call that filled it.
+    """
+
+    def __init__(self, run_batch, window, max_batch):
+        self._run_batch = run_batch  # list of items -> list of results, same order
+        self._window = window  # seconds
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flushed = threading.Event()  # Set once the pending batch is taken early
+
+    def submit(self, item):
+        future = Future()
+        with self._lock:
+            batch, flushed = self._pending, self._flushed
+            batch.append((item, future))
+            is_leader = len(batch) == 1
+            is_full = len(batch) >= self._max_batch
+            if is_full:
+                self._start_new_batch()
+
+        if is_full:
+            flushed.set()  # The leader no longer needs to wait out the window
+            self._run(batch)
+        elif is_leader:
+            flushed.wait(self._window)
+            with self._lock:
+                # Still pending unless a full batch was already taken
+                owns_batch = self._pending is batch
+                if owns_batch:
+                    self._start_new_batch()
+            if owns_batch:
+                self._run(batch)
+
+        return future.result()
+
+    def _start_new_batch(self):
+        """Close the pending batch so later calls start a new one (lock held)."""
+        self._pending = []
+        self._flushed = threading.Event()
+
+    def _run(self, batch):
+        """Run one batch and hand each waiting caller its result."""
+        try:
+            results = self._run_batch([queued for queued, _ in batch])
+            for (_, waiter), result in zip(batch, results):
+                waiter.set_result(result)
+        except Exception as e:
+            for _, waiter in batch:
+                waiter.set_exception(e)
+
 class LLMService:
     """
     LLM Service using Groq LLaMA 3.3 70B (Free tier: 14,400 requests/day).
@@ -31,17 +306,60 @@ class LLMService:
     Note: ChemLLM models not available on free HuggingFace Inference API
     """
 
+    CACHE_SIZE = 1024  # Distinct reaction contexts kept
+    CACHE_TTL = 86400  # seconds
+
+    # Output budget per reaction. The schema asks for roughly 4-6 + 3 x (2-3)
+    # sentences plus the flags and equation, about 400 tokens; generation time
+    # grows with output length, so the cap sits just above that
+    MAX_TOKENS = 600
+
+    # Reactions answered by one batched call, and a hard cap on its output
+    # so a large batch can't ask for more than the model will generate
+    MAX_BATCH = 8
+    MAX_BATCH_TOKENS = 4096
+
+    # Keep-alive connections to Groq stay open between requests (the SDK's
+    # default drops them after 5 idle seconds), so a burst of students mixing
+    # chemicals reuses warm TLS connections instead of handshaking again
+    HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=120)
+
     def __init__(self):
         self.api_key = os.getenv("GROQ_API_KEY")
         if self.api_key:
-            self.client = Groq(api_key=self.api_key)
+            self._http_client = DefaultHttpxClient(limits=self.HTTP_LIMITS)
+            self.client = Groq(api_key=self.api_key, http_client=self._http_client)
             self.model_name = 'llama-3.1-8b-instant'
             logger.info("✓ Using Groq LLaMA 3.3 70B (FREE tier)")
+            # Open the first connection in the background so the first
+            # explanation doesn't pay for DNS and the TLS handshake
+            threading.Thread(target=self._warm_up, daemon=True).start()
         else:
             logger.warning("❌ GROQ_API_KEY not found. LLM features will be disabled.")
             self.client = None
             self.model_name = None
 
+        # Optionally pack explanation requests that arrive together into one
+        # Groq call: a short wait per request in exchange for fewer calls
+        # against the free tier's requests-per-minute limit
+        batch_window_ms = int(os.getenv("LLM_BATCH_WINDOW_MS", 0))
+        self._batcher = None
+        if self.client and batch_window_ms > 0:
+            self._batcher = _MicroBatcher(self._generate_batch, batch_window_ms / 1000, self.MAX_BATCH)
+
+        # Generated content per reaction context. The same experiments are
+        # run over and over, and a hit skips a multi-second Groq round-trip.
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._in_flight = {}  # cache key -> Future of the call generating it
+
+    def _warm_up(self):
+        """Establish a pooled connection to the Groq API (best effort)."""
+        try:
+            self._http_client.head(str(self.client.base_url))
+        except Exception as e:
+            logger.debug(f"Groq connection warm-up failed: {e}")
+
     def generate_educational_content(self, reaction_data, ingredients, temperature='room', concentration='dilute', history=None):
         """
         Generate educational explanation considering reaction history.
@@ -51,156 +369,293 @@ class LLMService:
             logger.warning("LLM client not available, using fallback content")
             return self._get_fallback_content(reaction_data)
 
+        cache_key = self._cache_key(reaction_data, ingredients, temperature, concentration, history)
+        content = self._cache_get(cache_key)
+        if content:
+            return content
+
+        # Identical requests that arrive while one is already being generated
+        # wait for that answer instead of sending their own Groq call
+        with self._cache_lock:
+            future = self._in_flight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = self._in_flight[cache_key] = Future()
+
+        if not is_leader:
+            content = future.result()
+            return content if content is not None else self._get_fallback_content(reaction_data)
+
+        content = None
+        try:
+            if self._batcher:
+                content = self._batcher.submit((reaction_data, ingredients, temperature, concentration, history))
+            if content is None:
+                # Not batched, alone in its window or missed by the batch:
+                # this caller sends its own request on its own thread
+                content = self._generate_single(reaction_data, ingredients, temperature, concentration, history)
+
+            # Only successful answers are cached; failures retry on the next request
+            if content is not None:
+                self._cache_set(cache_key, content)
+        finally:
+            with self._cache_lock:
+                del self._in_flight[cache_key]
+            future.set_result(content)
+
+        if content is None:
+            return self._get_fallback_content(reaction_data)
+        return content
+
+    def stream_educational_content(self, reaction_data, ingredients, temperature='room', concentration='dilute', history=None):
+        """
+        Streaming version of generate_educational_content.
+
+        Yields ("explanation", text) with each new piece of the explanation
+        as the model writes it, then exactly one ("content", educational_content).
+        Cache hits, requests joining an identical in-flight call, micro-batched
+        requests and fallbacks yield only the final content.
+        """
+        if not self.client or self._batcher:
+            # A batched call answers several reactions at once, so there is
+            # no per-reaction stream to follow
+            yield "content", self.generate_educational_content(
+                reaction_data, ingredients, temperature, concentration, history
+            )
+            return
+
+        cache_key = self._cache_key(reaction_data, ingredients, temperature, concentration, history)
+        content = self._cache_get(cache_key)
+        if content:
+            yield "content", content
+            return
+
+        # Same coalescing as generate_educational_content, in both directions
+        with self._cache_lock:
+            future = self._in_flight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = self._in_flight[cache_key] = Future()
+
+        if not is_leader:
+            content = future.result()
+            yield "content", content if content is not None else self._get_fallback_content(reaction_data)
+            return
+
         prompt = self._build_prompt(reaction_data, ingredients, temperature, concentration, history)
+        reply = _FieldStreamer("explanation")
+        content = None
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    _STREAM_SYSTEM_MESSAGE,
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.7,
+                max_tokens=self.MAX_TOKENS,
+                stream=True
+            )
+
+            # The JSON answer arrives a few tokens at a time; only the
+            # explanation's text is passed on as it is written
+            for chunk in stream:
+                fragment = chunk.choices[0].delta.content if chunk.choices else None
+                if fragment:
+                    text = reply.feed(fragment)
+                    if text:
+                        yield "explanation", text
+
+            content = self._to_educational_content(orjson.loads(_json_object(reply.text)))
+            # Only successful answers are cached; failures retry on the next request
+            self._cache_set(cache_key, content)
+        except orjson.JSONDecodeError:
+            logger.warning(f"Failed to parse streamed Groq response as JSON: {reply.text}")
+        except Exception as e:
+            logger.error(f"Error streaming from Groq API: {e}")
+        finally:
+            # Also runs if the client disconnects mid-stream
+            with self._cache_lock:
+                del self._in_flight[cache_key]
+            future.set_result(content)
 
+        yield "content", content if content is not None else self._get_fallback_content(reaction_data)
+
+    def _cache_key(self, reaction_data, ingredients, temperature, concentration, history):
+        """Canonical, hashable form of everything the prompt is built from."""
+        return (
+            reaction_data.equation,
+            reaction_data.reaction_type,
+            tuple(reaction_data.visual_effects),
+            reaction_data.ph_value,
+            tuple(sorted(i.lower().strip() for i in ingredients)),
+            temperature,
+            concentration,
+            tuple(history or ())
+        )
+
+    def _cache_get(self, key):
+        """Return cached content that hasn't expired, or None."""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, content = entry
+            if time.monotonic() >= expires_at:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return content
+
+    def _cache_set(self, key, content):
+        """Cache content, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.CACHE_TTL, content)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _generate_batch(self, requests):
+        """
+        Generate educational content for several reactions with one Groq request.
+
+        Args:
+            requests: List of (reaction_data, ingredients, temperature, concentration, history) tuples
+
+        Returns:
+            list: Content dicts in the same order as the input, None where the
+                  batch had no usable answer (each caller then retries on its own)
+        """
+        if len(requests) == 1:
+            # Nothing to combine; the caller sends its own request
+            return [None]
+
+        sections = [
+            f"REACTION {idx}:\n{self._build_reaction_data(*request)}"
+            for idx, request in enumerate(requests)
+        ]
+        prompt = f"""{chr(10).join(sections)}
+
+There are {len(requests)} reactions above. Return one result per reaction, with "idx" set to its REACTION number."""
+
+        results = [None] * len(requests)
         try:
-            # Groq API call
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert chemistry education assistant. Provide comprehensive, detailed explanations suitable for students. Always respond with valid JSON only."
-                    },
+                    _SYSTEM_MESSAGE,
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
                 temperature=0.7,
-                max_tokens=1500,
-                response_format={"type": "json_object"}
+                max_tokens=min(self.MAX_TOKENS * len(requests), self.MAX_BATCH_TOKENS),
+                tools=[_BATCH_CONTENT_TOOL],
+                tool_choice=_tool_choice(_BATCH_CONTENT_TOOL)
             )
 
-            # Parse JSON from response
-            response_text = response.choices[0].message.content
+            content = orjson.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            for entry in content.get("results", []):
+                idx = entry.get("idx")
+                if isinstance(idx, int) and 0 <= idx < len(requests):
+                    results[idx] = self._to_educational_content(entry)
+            logger.info(f"Generated content for {len(requests)} reactions in one batch")
+        except Exception as e:
+            logger.error(f"Error batch calling Groq API for {len(requests)} reactions: {e}")
 
-            # Try to extract JSON from response
+        return results
+
+    def _generate_single(self, reaction_data, ingredients, temperature, concentration, history):
+        """Generate educational content for one reaction with its own Groq request (None on failure)."""
+        prompt = self._build_prompt(reaction_data, ingredients, temperature, concentration, history)
+
+        try:
+            # Groq API call
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    _SYSTEM_MESSAGE,
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.7,
+                max_tokens=self.MAX_TOKENS,
+                tools=[_CONTENT_TOOL],
+                tool_choice=_tool_choice(_CONTENT_TOOL)
+            )
+
+            # The content comes back as the arguments of the forced function call
+            arguments = response.choices[0].message.tool_calls[0].function.arguments
             try:
-                content = json.loads(response_text)
-            except json.JSONDecodeError:
-                logger.warning(f"Failed to parse Groq response as JSON: {response_text}")
-                return self._get_fallback_content(reaction_data)
-
-            return {
-                "explanation": content.get("explanation", ""),
-                "safety_tips": content.get("safety_tips", ""),
-                "concept": content.get("concept", ""),
-                "real_world_example": content.get("real_world_example", ""),
-                "visual_metadata": {
-                    "bubbles": content.get("bubbles", False),
-                    "precipitate": content.get("precipitate", False),
-                    "heat": content.get("heat", False),
-                    "color_change": content.get("color_change", None),
-                    "gas_smoke": content.get("gas_smoke", False),
-                    "equation": content.get("equation", "")
-                }
-            }
+                content = orjson.loads(arguments)
+            except orjson.JSONDecodeError:
+                logger.warning(f"Failed to parse Groq function arguments as JSON: {arguments}")
+                return None
+
+            return self._to_educational_content(content)
 
         except Exception as e:
             logger.error(f"Error calling Groq API: {e}")
             logger.error(f"Details: {str(e)}")
-            return self._get_fallback_content(reaction_data)
-    
-    def _build_prompt(self, reaction_data, ingredients, temperature='room', concentration='dilute', history=None):
-        """
-        Build improved prompt for Groq LLaMA 3.3 70B with chemistry-specific instructions.
+            return None
 
-        LLaMA 3.3 70B has excellent chemistry knowledge, allowing detailed instructions.
-        """
+    def _to_educational_content(self, content):
+        """Shape a parsed LLM JSON answer into the structure the engine expects."""
+        return {
+            "explanation": content.get("explanation", ""),
+            "safety_tips": content.get("safety_tips", ""),
+            "concept": content.get("concept", ""),
+            "real_world_example": content.get("real_world_example", ""),
+            "visual_metadata": {
+                "bubbles": content.get("bubbles", False),
+                "precipitate": content.get("precipitate", False),
+                "heat": content.get("heat", False),
+                "color_change": content.get("color_change", None),
+                "gas_smoke": content.get("gas_smoke", False),
+                "equation": content.get("equation", "")
+            }
+        }
+
+    def _prompt_fields(self, reaction_data, ingredients, temperature, concentration, history):
+        """Compute the dynamic values substituted into the prompt templates."""
         history_text = ""
         if history and len(history) > 1:
             history_text = f"\n- Step-by-step Reaction History: {' -> '.join(history)}"
 
-        return f"""You are an expert chemistry education assistant. Provide comprehensive, detailed explanations suitable for high school and early college students.
-
-REACTION DATA:
-- Initial Ingredients: {', '.join(ingredients)}
-- Chemical Equation: {reaction_data.get('equation', 'Unknown')}
-- Reaction Type: {reaction_data.get('reaction_type', 'Unknown')}
-- Conditions: Temperature = {temperature}, Concentration = {concentration}{history_text}
-- Observable Effects: {', '.join(reaction_data.get('visual_effects', []))}
-- Final pH: {reaction_data.get('ph_value', 7)}
-
-CRITICAL - VERIFY REACTION VALIDITY:
-BEFORE providing the response, you MUST verify:
-1. Do these chemicals ACTUALLY react under the given conditions?
-2. Are special conditions (heat, concentration, catalyst) required?
-3. Follow theoretical chemistry principles (reactivity series, solubility rules, acid-base theory)
-4. If chemicals DON'T react under these conditions, state that clearly in the explanation
-
-INSTRUCTION - Provide DETAILED Chemistry Education:
-Explain what happens when these chemicals are mixed. Include:
-- WHETHER they react or just mix (be accurate!)
-- What is happening at the molecular level
-- Why the reactants combine (or don't combine) in this way
-- The role of concentration and temperature
-- What students should observe and why
-- How this relates to broader chemistry concepts
-
-RESPOND WITH VALID JSON ONLY (no extra text before or after):
-{{
-  "explanation": "Comprehensive explanation (4-6 sentences). FIRST state if reaction occurs or not. Then explain WHAT happens, WHY at the molecular/ionic level, discuss conditions and observable changes. Be accurate about chemistry.",
-  "safety_tips": "Specific, practical safety precautions for these chemicals (2-3 sentences). Explain what hazards exist and what protective measures are needed.",
-  "concept": "The chemistry concept name and a detailed description (2-3 sentences). Explain what type of reaction this is, why it's classified that way, and what makes it significant. Example format: 'Redox Reaction - A reaction involving transfer of electrons between reactants, where one substance is oxidized and another is reduced, causing change in oxidation states.'",
-  "real_world_example": "A detailed practical application (2-3 sentences). Explain how and why this reaction is used in industry, medicine, or everyday life, and what makes it important.",
-  "bubbles": true or false (set true ONLY if gas is produced - H₂, CO₂, O₂, etc.),
-  "precipitate": true or false (set true ONLY if insoluble solid forms),
-  "heat": true or false (set true ONLY if reaction is exothermic and releases noticeable heat),
-  "gas_smoke": true or false (set true if visible gas/smoke/vapor is produced - like NO₂ brown gas, Cl₂ yellow-green gas, SO₂, NH₃ vapor, etc.),
-  "color_change": "hex color like #FF0000 or null (final solution color if changed)",
-  "equation": "the balanced chemical equation (or 'No Reaction' if chemicals don't react)"
-}}
-
-VISUAL EFFECTS ACCURACY:
-- "bubbles": true ONLY if gas bubbles form (H₂, CO₂, O₂, etc.)
-- "gas_smoke": true ONLY if colored gas/smoke/vapor is visible (NO₂, Cl₂, SO₂, NH₃, etc.)
-- "precipitate": true ONLY if solid particles form and settle/suspend
-- "heat": true ONLY if reaction releases significant heat (exothermic)
-- Be chemically accurate - don't invent effects that won't happen!
-
-QUALITY REQUIREMENTS:
-- Be thorough and educational, not superficial
-- Use correct chemistry terminology and principles
-- Explain the WHY, not just the WHAT
-- BE ACCURATE - verify reaction actually occurs under these conditions
-- If no reaction occurs, explain why (reactivity, conditions, etc.)
-- Include relevant details about molecular interactions"""
+        return {
+            "ingredients": ', '.join(ingredients),
+            "equation": reaction_data.equation,
+            "reaction_type": reaction_data.reaction_type,
+            "temperature": temperature,
+            "concentration": concentration,
+            "history": history_text,
+            "visual_effects": ', '.join(reaction_data.visual_effects),
+            "ph_value": reaction_data.ph_value
+        }
+
+    def _build_reaction_data(self, reaction_data, ingredients, temperature='room', concentration='dilute', history=None):
+        """Build the per-reaction lines of the prompt."""
+        return _REACTION_DATA_TEMPLATE.format(
+            **self._prompt_fields(reaction_data, ingredients, temperature, concentration, history)
+        )
+    
+    def _build_prompt(self, reaction_data, ingredients, temperature='room', concentration='dilute', history=None):
+        """
+        Build the user message for one reaction.
+
+        The chemistry-specific instructions live in _SYSTEM_PROMPT; this is
+        only the per-request REACTION DATA block.
+        """
+        return _PROMPT_TEMPLATE.format(
+            **self._prompt_fields(reaction_data, ingredients, temperature, concentration, history)
+        )
     
     def _get_fallback_content(self, reaction_data):
         """Fallback content when LLM is unavailable - provides detailed explanations."""
-        reaction_type = reaction_data.get('reaction_type', 'mixture')
-
-        fallback_map = {
-            "neutralization": {
-                "explanation": "In a neutralization reaction, an acid (H+ donor) reacts with a base (OH- donor) to form salt and water. The H+ ions from the acid combine with OH- ions from the base, producing water and ionic salts. The solution becomes less acidic or basic, approaching neutral pH 7, and typically releases heat energy (exothermic). This is a fundamental acid-base reaction in chemistry.",
-                "safety_tips": "Always add acid to base slowly (never the reverse) to prevent violent reactions and splashing. Wear goggles and gloves. If you spill acid or base, neutralize with the opposite substance before cleanup. Use proper ventilation.",
-                "concept": "Acid-Base Neutralization Reaction - An exothermic reaction where hydrogen ions (H+) from an acid combine with hydroxide ions (OH-) from a base to form water and a salt. This balances pH and is essential in chemistry and industry.",
-                "real_world_example": "Antacids (like calcium carbonate or sodium bicarbonate) neutralize excess stomach acid to relieve heartburn. Industrial acid-base neutralization is used in water treatment to adjust pH levels in drinking water and wastewater."
-            },
-            "single_displacement": {
-                "explanation": "In a displacement reaction, a more reactive element replaces a less reactive element in a compound. The reactivity of metals follows a predictable order - more reactive metals can displace less reactive metals from their salts or acids. This occurs because the more reactive metal has a stronger tendency to lose electrons and form positive ions, driving the reaction forward.",
-                "safety_tips": "Handle reactive metals carefully as they can react violently with water or acid. Never touch reactive metals with bare hands. Dispose of metal salts and unreacted metals according to chemical waste guidelines. Work in a well-ventilated area or fume hood.",
-                "concept": "Single Displacement (Substitution) Reaction - A reaction where a more reactive element displaces a less reactive element from a compound, based on relative reactivity. This demonstrates the electrochemical series and electron transfer principles in redox reactions.",
-                "real_world_example": "The extraction of pure metals from ores uses displacement principles - for example, carbon displaces metals from their oxides in industrial smelting. Galvanizing (coating steel with zinc) protects against rust through displacement chemistry. Cathodic protection in pipelines uses similar displacement principles."
-            },
-            "precipitation": {
-                "explanation": "A precipitation reaction occurs when two soluble ionic compounds combine to form an insoluble solid (precipitate) that separates from the solution. The insoluble product forms because the ions have reduced solubility when combined, exceeding the solubility product constant. The precipitate settles out as a distinct solid phase, while the solution retains dissolved ions.",
-                "safety_tips": "Avoid skin contact with precipitates as some are toxic. Use appropriate gloves and eye protection. Some precipitates (like barium sulfate) are harmless, while others require careful disposal. Always wash hands after handling and dispose of chemical waste in designated containers.",
-                "concept": "Precipitation Reaction - A reaction between soluble ionic compounds that produces an insoluble solid (precipitate) when ions combine. The driving force is the formation of a compound with low solubility, and these reactions are essential for analytical chemistry and industrial processes.",
-                "real_world_example": "Water treatment plants use precipitation reactions to remove hardness (calcium and magnesium ions) and contaminating ions. In analytical chemistry, precipitation is used to identify and quantify specific ions. Photography and pharmaceutical manufacturing rely on precipitation for product purification."
-            },
-            "redox": {
-                "explanation": "A redox (reduction-oxidation) reaction involves the transfer of electrons between reactants. One reactant is oxidized (loses electrons) while another is reduced (gains electrons). Oxidation states change as electrons transfer, and the number of electrons lost must equal the number gained. These reactions release or absorb energy depending on whether bonds are broken or formed.",
-                "safety_tips": "Many redox reactions are vigorous and can release significant heat or gases. Ensure proper ventilation, use appropriate glassware, and never mix incompatible oxidizing and reducing agents. Always follow proper chemical handling procedures and safety guidelines.",
-                "concept": "Redox (Oxidation-Reduction) Reaction - A reaction where electrons are transferred from one reactant (reducing agent) to another (oxidizing agent), causing changes in oxidation states. These reactions are fundamental to chemistry, including combustion, corrosion, and photosynthesis.",
-                "real_world_example": "Combustion reactions are redox reactions that power engines and generate electricity. Cellular respiration (oxidizing glucose) provides energy for all living organisms. Batteries and fuel cells operate through controlled redox reactions to generate electrical energy."
-            }
-        }
-
-        return fallback_map.get(reaction_type, {
-            "explanation": "These substances are being mixed together. Observe any changes in color, temperature, physical state, or other properties. Even if no obvious reaction occurs, molecular interactions may be happening at the particulate level that aren't easily visible.",
-            "safety_tips": "Always wear appropriate personal protective equipment (goggles, gloves, lab coat). Work in a well-ventilated area. Read safety data sheets for all chemicals before handling. Know the location of emergency equipment.",
-            "concept": "Chemical Mixture or Interaction - A combination of substances that may or may not undergo observable chemical changes. Understanding interactions between substances is fundamental to chemistry.",
-            "real_world_example": "Understanding how different chemicals interact is essential in pharmacy, food science, environmental remediation, and countless industrial processes where controlled mixing produces desired products."
-        })
+        return _FALLBACK_MAP.get(reaction_data.reaction_type, _DEFAULT_FALLBACK)
@@ -4,10 +4,21 @@ Programmatic access to PubChem names, formulas, and properties.
 Supports bulk operations and high-level chemical data retrieval.
 """
 
+import json
+import os
+import random
+import sqlite3
+import orjson
 import pubchempy as pcp
 import requests
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
 import time
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,80 +26,208 @@ logger = logging.getLogger(__name__)
 # Suppress noisy pubchempy logging
 logging.getLogger('pubchempy').setLevel(logging.WARNING)
 
+# Properties fetched by the PUG REST lookups. PubChem deprecated
+# CanonicalSMILES in favour of ConnectivitySMILES (the same string, and what
+# PubChemPy's canonical_smiles now maps to)
+_PROPERTIES = "Title,MolecularFormula,MolecularWeight,IUPACName,ConnectivitySMILES"
+
+def _smiles(properties):
+    """SMILES from a PUG REST property record, under its current or legacy key."""
+    return properties.get('ConnectivitySMILES') or properties.get('CanonicalSMILES')
+
+# HTTP statuses PubChem returns when it is overloaded or briefly failing
+_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket: allows short bursts of up to `capacity` calls,
+    then `rate` calls per second on average.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate  # tokens added per second
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class PubChemService:
     """Service for interacting with PubChem API using PubChemPy wrapper with raw REST fallback."""
     
     BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
-    RATE_LIMIT_DELAY = 0.2  # Safety delay between requests
+    RATE_LIMIT = 5.0  # Requests per second allowed by PubChem's usage policy
+    RATE_LIMIT_BURST = 5  # Requests that may go out back to back
+    CACHE_SIZE = 4096  # Max cached lookups (compound records per CID rarely change)
+    MAX_CIDS_PER_REQUEST = 200  # CIDs per batch property request
+    DISK_CACHE_TTL = 30 * 86400  # seconds an on-disk lookup stays valid
+    MAX_RETRIES = 4  # Extra attempts for a request PubChem reports as busy
+    BACKOFF_BASE = 1.0  # seconds before the first retry, doubled on each failure
+    BACKOFF_MAX = 30.0  # cap on a single backoff delay
     
-    def __init__(self):
-        self.last_request_time = 0
+    def __init__(self, cache_path=None):
+        """
+        Args:
+            cache_path: SQLite file that keeps lookups across runs (defaults to
+                        PUBCHEM_CACHE_PATH; without either, lookups are only
+                        cached in memory)
+        """
+        self._bucket = _TokenBucket(self.RATE_LIMIT_BURST, self.RATE_LIMIT)
+
+        # LRU cache of successful lookups, shared by all request threads
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Optional persistent layer under the LRU, so re-running the seed
+        # script doesn't repeat every PubChem call
+        self._disk = None
+        cache_path = cache_path or os.getenv('PUBCHEM_CACHE_PATH')
+        if cache_path:
+            self._disk = sqlite3.connect(cache_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS lookups (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._disk.commit()
+
+        # Reuse one keep-alive connection pool for all raw PUG REST calls
+        # instead of paying a TCP + TLS handshake per request
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'AI-ChemLab/1.0'})
+        # Enough pooled connections for every request/seeding thread, and
+        # transient PubChem errors (including 429 "busy") retried with jittered
+        # exponential backoff, waiting out any Retry-After header PubChem sends.
+        # The batch POST only reads data, so it is safe to retry too.
+        retry = Retry(
+            total=self.MAX_RETRIES,
+            backoff_factor=self.BACKOFF_BASE / 2,
+            backoff_max=self.BACKOFF_MAX,
+            backoff_jitter=self.BACKOFF_BASE / 2,
+            status_forcelist=sorted(_RETRY_STATUSES),
+            allowed_methods=['GET', 'POST'],
+            respect_retry_after_header=True
+        )
+        self.session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
     
     def _rate_limit(self):
-        """Internal rate limiting to be polite to PubChem API."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.RATE_LIMIT_DELAY:
-            time.sleep(self.RATE_LIMIT_DELAY - time_since_last)
-        self.last_request_time = time.time()
+        """Internal rate limiting to be polite to PubChem API (safe to call from several threads)."""
+        self._bucket.acquire()
+
+    def _call_pubchempy(self, func, *args):
+        """
+        Call a PubChemPy function under the rate limit, retrying with jittered
+        exponential backoff while PubChem reports itself busy.
+        PubChemPy doesn't expose response headers, so Retry-After can't be read here.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            self._rate_limit()
+            try:
+                return func(*args)
+            except pcp.PubChemHTTPError as e:
+                if e.code not in _RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                    raise
+                delay = random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"PubChem busy ({e.code}), retrying in {delay:.1f}s")
+                time.sleep(delay)
     
+    def _cache_get(self, key):
+        """Return a cached lookup result, or None on a miss."""
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+                return value
+
+            if self._disk is None:
+                return None
+            row = self._disk.execute(
+                "SELECT value, expires_at FROM lookups WHERE key = ?", (json.dumps(key),)
+            ).fetchone()
+            if row is None or row[1] < time.time():
+                return None
+            value = json.loads(row[0])
+            self._cache[key] = value
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return value
+
+    def _cache_set(self, key, value):
+        """Cache a lookup result, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO lookups (key, value, expires_at) VALUES (?, ?, ?)",
+                    (json.dumps(key), json.dumps(value), time.time() + self.DISK_CACHE_TTL)
+                )
+                self._disk.commit()
+
     def get_chemical_by_name(self, name):
-        """Fetch chemical data using PubChemPy with fallback to raw PUG REST."""
-        self._rate_limit()
-        
-        # 1. Try PubChemPy Wrapper
-        try:
-            compounds = pcp.get_compounds(name, 'name')
-            if compounds:
-                comp = compounds[0]
-                return {
-                    'cid': comp.cid,
-                    'name': comp.synonyms[0] if comp.synonyms else name,
-                    'formula': comp.molecular_formula,
-                    'molecular_weight': comp.molecular_weight,
-                    'iupac_name': comp.iupac_name,
-                    'smiles': comp.smiles
-                }
-        except Exception as e:
-            logger.warning(f"PubChemPy wrapper failed for {name}, trying raw API: {e}")
+        """Fetch chemical data using raw PUG REST with fallback to PubChemPy."""
+        cache_key = ('name', name.lower().strip())
+        cached = self._cache_get(cache_key)
+        if cached:
+            return cached
 
-        # 2. Fallback to Raw PUG REST API
-        return self._fetch_raw_pug_rest(name, 'name')
+        chem_data = self._fetch_raw_pug_rest(name, 'name') or self._fetch_pubchempy(name, 'name')
+        if chem_data:
+            self._cache_set(cache_key, chem_data)
+        return chem_data
 
     def _fetch_raw_pug_rest(self, identifier, identifier_type='name'):
-        """Direct PUG REST API call as fallback."""
+        """
+        Direct PUG REST property call: CID, name (Title) and properties in a
+        single request, where PubChemPy needs several.
+        """
+        self._rate_limit()
         try:
-            props = "MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES"
-            url = f"{self.BASE_URL}/compound/{identifier_type}/{identifier}/property/{props}/JSON"
+            url = f"{self.BASE_URL}/compound/{identifier_type}/{quote(str(identifier), safe='')}/property/{_PROPERTIES}/JSON"
             
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if 'PropertyTable' in data and 'Properties' in data['PropertyTable']:
                     p = data['PropertyTable']['Properties'][0]
-                    return {
-                        'cid': p.get('CID'),
-                        'name': str(identifier),
-                        'formula': p.get('MolecularFormula'),
-                        'molecular_weight': p.get('MolecularWeight'),
-                        'iupac_name': p.get('IUPACName'),
-                        'smiles': p.get('CanonicalSMILES')
-                    }
+                    if p.get('CID'):
+                        return {
+                            'cid': p['CID'],
+                            'name': p.get('Title') or (str(identifier) if identifier_type == 'name' else f"CID_{identifier}"),
+                            'formula': p.get('MolecularFormula'),
+                            'molecular_weight': p.get('MolecularWeight'),
+                            'iupac_name': p.get('IUPACName'),
+                            'smiles': _smiles(p)
+                        }
+            elif response.status_code != 404:
+                logger.warning(f"PUG REST lookup for {identifier_type} '{identifier}' returned HTTP {response.status_code}")
             return None
         except Exception as e:
-            logger.error(f"Raw PUG REST fallback failed: {e}")
+            logger.warning(f"PUG REST lookup failed for {identifier_type} '{identifier}', trying PubChemPy: {e}")
             return None
 
-    def get_chemical_by_cid(self, cid):
-        """Fetch chemical data by PubChem Compound ID."""
-        self._rate_limit()
+    def _fetch_pubchempy(self, identifier, identifier_type='name'):
+        """Fallback lookup through the PubChemPy wrapper."""
         try:
-            compounds = pcp.get_compounds(cid, 'cid')
+            compounds = self._call_pubchempy(pcp.get_compounds, identifier, identifier_type)
             if compounds:
                 comp = compounds[0]
                 return {
                     'cid': comp.cid,
-                    'name': comp.synonyms[0] if comp.synonyms else f"CID_{cid}",
+                    'name': comp.synonyms[0] if comp.synonyms else (identifier if identifier_type == 'name' else f"CID_{identifier}"),
                     'formula': comp.molecular_formula,
                     'molecular_weight': comp.molecular_weight,
                     'iupac_name': comp.iupac_name,
@@ -97,21 +236,91 @@ class PubChemService:
             return None
         except pcp.PubChemHTTPError as e:
             if "404" in str(e):
-                logger.warning(f"CID {cid} not found in PubChem (404)")
+                logger.warning(f"{identifier_type} '{identifier}' not found in PubChem (404)")
             else:
-                logger.error(f"PubChem HTTP error fetching CID {cid}: {e}")
+                logger.error(f"PubChem HTTP error fetching {identifier_type} '{identifier}': {e}")
             return None
         except Exception as e:
-            logger.error(f"Unexpected error fetching CID {cid}: {e}")
+            logger.error(f"Unexpected error fetching {identifier_type} '{identifier}': {e}")
             return None
 
+    def get_chemical_by_cid(self, cid):
+        """Fetch chemical data by PubChem Compound ID."""
+        cached = self._cache_get(('cid', int(cid)))
+        if cached:
+            return cached
+
+        chem_data = self._fetch_raw_pug_rest(cid, 'cid') or self._fetch_pubchempy(cid, 'cid')
+        if chem_data:
+            self._cache_set(('cid', int(cid)), chem_data)
+        return chem_data
+
+    def get_chemicals_by_cids(self, cids):
+        """
+        Fetch chemical data for several CIDs with one PUG REST request per
+        MAX_CIDS_PER_REQUEST CIDs.
+        Returns a list of chemical dicts in the same order as the CIDs found.
+        """
+        found = {}
+        missing = []
+        # Each distinct CID is looked up (and requested) once
+        for cid in dict.fromkeys(int(cid) for cid in cids):
+            cached = self._cache_get(('cid', cid))
+            if cached:
+                found[cid] = cached
+            else:
+                missing.append(cid)
+
+        # PubChem caps how many CIDs one request may list
+        for start in range(0, len(missing), self.MAX_CIDS_PER_REQUEST):
+            found.update(self._fetch_cids_batch(missing[start:start + self.MAX_CIDS_PER_REQUEST]))
+
+        return [found[int(cid)] for cid in cids if int(cid) in found]
+
+    def _fetch_cids_batch(self, cids):
+        """Fetch uncached CIDs from PUG REST in one POST, returning {cid: chemical dict}."""
+        self._rate_limit()
+        try:
+            url = f"{self.BASE_URL}/compound/cid/property/{_PROPERTIES}/JSON"
+
+            # POST keeps long CID lists out of the URL
+            response = self.session.post(url, data={'cid': ','.join(str(cid) for cid in cids)}, timeout=15)
+            if response.status_code != 200:
+                logger.warning(f"PubChem batch fetch returned HTTP {response.status_code}")
+                return {}
+
+            data = orjson.loads(response.content)
+            results = {}
+            for p in data.get('PropertyTable', {}).get('Properties', []):
+                chem_data = {
+                    'cid': p.get('CID'),
+                    'name': p.get('Title') or f"CID_{p.get('CID')}",
+                    'formula': p.get('MolecularFormula'),
+                    'molecular_weight': p.get('MolecularWeight'),
+                    'iupac_name': p.get('IUPACName'),
+                    'smiles': _smiles(p)
+                }
+                self._cache_set(('cid', chem_data['cid']), chem_data)
+                results[chem_data['cid']] = chem_data
+            return results
+        except Exception as e:
+            logger.error(f"PubChem batch fetch failed for {len(cids)} CIDs: {e}")
+            return {}
+
     def search_chemicals_by_keyword(self, keyword, max_results=20):
         """Search for chemicals by keyword and return list of CIDs."""
-        self._rate_limit()
+        cache_key = ('search', keyword.lower().strip())
+        cached = self._cache_get(cache_key)
+        if cached:
+            return cached[:max_results]
+
         try:
             # get_cids handles the name-to-CID conversion
-            cids = pcp.get_cids(keyword, 'name')
-            return cids[:max_results] if cids else []
+            cids = self._call_pubchempy(pcp.get_cids, keyword, 'name')
+            if not cids:
+                return []
+            self._cache_set(cache_key, cids)
+            return cids[:max_results]
         except pcp.PubChemHTTPError as e:
             if "404" in str(e):
                 logger.debug(f"Keyword '{keyword}' produced 404 search result")
@@ -122,9 +331,8 @@ class PubChemService:
 
     def get_chemicals_by_formula(self, formula, max_results=10):
         """Get chemicals by molecular formula."""
-        self._rate_limit()
         try:
-            compounds = pcp.get_compounds(formula, 'formula')
+            compounds = self._call_pubchempy(pcp.get_compounds, formula, 'formula')
             return [c.cid for c in compounds[:max_results]] if compounds else []
         except Exception as e:
             logger.error(f"PubChemPy formula search error for '{formula}': {e}")
@@ -135,9 +343,16 @@ class PubChemService:
         Fetch multiple compounds in a single operation.
         identifiers: list of names, CIDs, or SMILES
         """
-        self._rate_limit()
+        # Drop repeats (keeping order) so each compound is only fetched once
+        identifiers = list(dict.fromkeys(identifiers))
+
+        if identifier_type == 'cid':
+            # CIDs can share a property request; pubchempy would build a full
+            # Compound record (and look up synonyms) for each one
+            return self.get_chemicals_by_cids(identifiers)
+
         try:
-            compounds = pcp.get_compounds(identifiers, identifier_type)
+            compounds = self._call_pubchempy(pcp.get_compounds, identifiers, identifier_type)
             results = []
             for comp in compounds:
                 results.append({
@@ -171,11 +386,16 @@ class PubChemService:
         
         keywords = category_keywords.get(category, [])
         all_cids = set()
-        
-        for kw in keywords:
-            logger.info(f"    Searching for expansion: '{kw}'...")
-            cids = self.search_chemicals_by_keyword(kw, max_results=max_per_keyword)
-            if cids:
-                all_cids.update(cids)
+
+        def search(kw):
+            logger.debug(f"    Searching for expansion: '{kw}'...")
+            return self.search_chemicals_by_keyword(kw, max_results=max_per_keyword)
+
+        # Run the keyword searches side by side; the token bucket still
+        # keeps them within PubChem's request rate
+        with ThreadPoolExecutor(max_workers=max(1, len(keywords))) as executor:
+            for cids in executor.map(search, keywords):
+                if cids:
+                    all_cids.update(cids)
         
         return list(all_cids)
@@ -19,6 +19,8 @@ it calculates the next reaction automatically (cascading reactions).
 """
 
 import logging
+from collections import Counter
+from functools import lru_cache
 
 # Import backend modules - handle both package and direct execution
 try:
@@ -31,6 +33,32 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Animation triggers in every response, with the value used when neither the
+# rules nor the LLM set one
+_TRIGGER_DEFAULTS = {
+    "bubbles": False,
+    "precipitate": False,
+    "heat": False,
+    "color_change": None,
+    "gas_smoke": False
+}
+
+# Particle effect picked from the triggers when the rules don't name one,
+# in priority order
+_PARTICLE_BY_TRIGGER = (
+    ("bubbles", "bubble"),
+    ("precipitate", "precipitate")
+)
+
+# Symptom reported for each trigger the LLM detects in an unknown reaction
+_EFFECT_BY_TRIGGER = (
+    ("bubbles", "gas_evolution"),
+    ("gas_smoke", "visible_gas_smoke"),
+    ("precipitate", "precipitate_forming"),
+    ("heat", "heat_released"),
+    ("color_change", "color_change")
+)
+
 
 class ReactionEngine:
     """
@@ -78,6 +106,7 @@ class ReactionEngine:
         This helps students see what the beaker looks like when they add
         their first chemical.
         """
+        # initial_colors is keyed by lowercase name, built once at import
         return self.chemistry_rules.initial_colors.get(name.lower(), "#FFFFFF22")
 
     def predict_reaction(self, ingredients, temperature='room', concentration='dilute'):
@@ -120,21 +149,108 @@ class ReactionEngine:
         if not ingredients:
             return {"error": "No ingredients provided"}
 
-        # Normalize ingredient names for lookup
-        current_substances = [i.lower().strip() for i in ingredients]
+        reaction_data, history, visual_steps, current_substances = self._simulate(
+            ingredients, temperature, concentration
+        )
+
+        # STEP 7: GENERATIVE LAYER - Get AI explanations
+        # Pass the full reaction history so AI can explain what happened
+        educational_content = self.llm_service.generate_educational_content(
+            reaction_data,
+            ingredients,
+            temperature=temperature,
+            concentration=concentration,
+            history=history  # All equations
+        )
+
+        return self._build_response(reaction_data, current_substances, visual_steps, educational_content)
+
+    def stream_reaction(self, ingredients, temperature='room', concentration='dilute'):
+        """
+        Streaming version of predict_reaction.
+
+        Yields ("rules", response) with the rule-based result as soon as the
+        cascade is done (without AI content), ("explanation", text) for
+        each new piece of the AI explanation as it is generated, then
+        ("result", response) with the same complete response predict_reaction returns.
+        """
+        reaction_data, history, visual_steps, current_substances = self._simulate(
+            ingredients, temperature, concentration
+        )
+
+        # The beaker can start animating while the explanation is generated
+        yield "rules", self._build_response(reaction_data, current_substances, visual_steps, {})
+
+        educational_content = None
+        for kind, payload in self.llm_service.stream_educational_content(
+            reaction_data,
+            ingredients,
+            temperature=temperature,
+            concentration=concentration,
+            history=history
+        ):
+            if kind == "explanation":
+                yield "explanation", payload
+            else:
+                educational_content = payload
+
+        yield "result", self._build_response(reaction_data, current_substances, visual_steps, educational_content)
+
+    def _simulate(self, ingredients, temperature, concentration):
+        """
+        Run the rule-based cascade (steps 1-6 of predict_reaction).
+
+        Returns:
+            tuple: (primary reaction, equations of every reaction that happened,
+                    visual animation steps, substances left in the beaker)
+        """
+        # Normalize ingredient names for lookup. The order they were added in
+        # doesn't change the outcome, so sorting lets every order share a cache entry
+        substances = tuple(sorted(map(self.chemistry_rules.normalize_name, ingredients)))
+        reaction_history, visual_steps, current_substances = self._cascade(substances, temperature, concentration)
+
+        # STEP 6: Determine primary reaction for UI display
+        # If no reactions happened, use default response
+        if not reaction_history:
+            reaction_data = self.chemistry_rules.get_default_response(ingredients)
+        else:
+            # Use the LAST (most recent) reaction for primary UI display
+            # Earlier reactions are shown in visual_steps animation
+            reaction_data = reaction_history[-1]
+
+        return reaction_data, [r.equation for r in reaction_history], list(visual_steps), list(current_substances)
+
+    @lru_cache(maxsize=1024)
+    def _cascade(self, substances, temperature, concentration):
+        """
+        Cascading rule lookups (steps 1-5) for a sorted tuple of normalized names.
+        The rules are read-only, so results are memoized; the same mixes are
+        made over and over in a classroom.
+
+        Returns:
+            tuple: (reactions that happened, visual animation steps, substances left)
+        """
+        # Multiset of what is in the beaker: a reaction consumes one of each
+        # reactant, so extra portions of an ingredient stay behind
+        current_substances = Counter(substances)
+
+        # Per-step traces are debug-only; skip building them when nobody reads them
+        trace = logger.isEnabledFor(logging.DEBUG)
 
         # AUTO-ADD WATER FOR AQUEOUS REACTIONS
         # If not already present, add water for most common aqueous reactions
         should_add_water = self._should_add_water(current_substances)
         if should_add_water and "water" not in current_substances:
-            current_substances.append("water")
-            logger.info(f"Auto-added water for aqueous reaction: {current_substances}")
+            current_substances["water"] += 1
+            if trace:
+                logger.debug(f"Auto-added water for aqueous reaction: {list(current_substances.elements())}")
 
         reaction_history = []  # Track all reactions that happen
         visual_steps = []  # Animation steps for the frontend
         max_iterations = 5  # Prevent infinite loops from cascading reactions
 
-        logger.info(f"Starting reaction simulation with: {current_substances}")
+        if trace:
+            logger.debug(f"Starting reaction simulation with: {list(current_substances.elements())}")
         
         # CASCADING REACTIONS: Keep checking if products react further
         iteration = 0
@@ -149,7 +265,7 @@ class ReactionEngine:
             )
 
             # No reaction found - exit the loop
-            if not reaction_data or reaction_data.get("reaction_type") == "no_reaction":
+            if not reaction_data or reaction_data.reaction_type == "no_reaction":
                 break
 
             # STEP 2: A reaction was found!
@@ -157,158 +273,117 @@ class ReactionEngine:
 
             # STEP 3: Find which specific reactants from our rules matched
             # This helps us know which substances to remove from current_substances
-            matched_reactants = []
-            for r_key in self.chemistry_rules.reactions.keys():
-                if set(r_key).issubset(set(current_substances)):
-                    potential_data = self.chemistry_rules.reactions[r_key]
-                    # Check if there are condition-specific reaction rules
-                    if "conditions" in potential_data:
-                        potential_data = potential_data["conditions"].get(
-                            f"{temperature}_{concentration}",
-                            potential_data["conditions"].get("room_dilute")
-                        )
-
-                    if potential_data == reaction_data:
-                        matched_reactants = list(r_key)
-                        break
+            # Only reactions that share an ingredient with the beaker are checked
+            matched_reactants = frozenset()
+            for r_key, entry in self.chemistry_rules.matching_reactions(current_substances.keys()):
+                # Check if there are condition-specific reaction rules
+                potential_data = self.chemistry_rules.resolve_conditions(entry, temperature, concentration)
+
+                if potential_data == reaction_data:
+                    # Keys are already frozensets; no need to copy them
+                    matched_reactants = r_key
+                    break
 
             if not matched_reactants:
                 break
 
             # STEP 4: Prepare visual animation step for the frontend
             visual_steps.append({
-                "equation": reaction_data.get("equation"),
-                "animation_triggers": reaction_data.get("animation_triggers"),
-                "liquidColor": reaction_data.get("liquid_color"),
-                "particleType": reaction_data.get("particle_type"),
-                "particleColor": reaction_data.get("particle_color"),
-                "symptoms": reaction_data.get("visual_effects", [])
+                "equation": reaction_data.equation,
+                "animation_triggers": reaction_data.animation_triggers,
+                "liquidColor": reaction_data.liquid_color,
+                "particleType": reaction_data.particle_type,
+                "particleColor": reaction_data.particle_color,
+                "symptoms": reaction_data.visual_effects
             })
 
             # STEP 5: Update the substances list for the next iteration
-            # Remove reactants that were consumed
-            for r in matched_reactants:
-                if r in current_substances:
-                    current_substances.remove(r)
+            # Remove reactants that were consumed (subtract drops counts that reach zero)
+            current_substances -= Counter(matched_reactants)
 
             # Add the products formed
-            current_substances.extend([p.lower() for p in reaction_data.get("products", [])])
-            logger.info(f"Iteration {iteration} result: {current_substances}")
+            current_substances.update(p.lower() for p in reaction_data.products)
+            if trace:
+                logger.debug(f"Iteration {iteration} result: {list(current_substances.elements())}")
 
-        # STEP 6: Determine primary reaction for UI display
-        # If no reactions happened, use default response
-        if not reaction_history:
-            reaction_data = self.chemistry_rules.get_default_response(ingredients)
-        else:
-            # Use the LAST (most recent) reaction for primary UI display
-            # Earlier reactions are shown in visual_steps animation
-            reaction_data = reaction_history[-1]
-
-        # STEP 7: GENERATIVE LAYER - Get AI explanations
-        # Pass the full reaction history so AI can explain what happened
-        educational_content = self.llm_service.generate_educational_content(
-            reaction_data,
-            ingredients,
-            temperature=temperature,
-            concentration=concentration,
-            history=[r.get("equation") for r in reaction_history]  # All equations
-        )
+        # Distinct substances left in the beaker
+        return tuple(reaction_history), tuple(visual_steps), tuple(current_substances)
 
+    def _build_response(self, reaction_data, current_substances, visual_steps, educational_content):
+        """Merge rule results with AI content into the response for the frontend (steps 8-9)."""
         # STEP 8: Merge data into final response
         viz = educational_content.get("visual_metadata", {})
 
         # Combine visual triggers:
         # - If reaction is in database (triggers not None): use hardcoded rules as primary, LLM as fallback
         # - If reaction NOT in database (triggers is None): use LLM as primary source
-        triggers = reaction_data.get("animation_triggers")
-
-        if triggers is None:
-            # Unknown reaction - trust the LLM's analysis
-            final_triggers = {
-                "bubbles": viz.get("bubbles", False),
-                "precipitate": viz.get("precipitate", False),
-                "heat": viz.get("heat", False),
-                "color_change": viz.get("color_change", None),
-                "gas_smoke": viz.get("gas_smoke", False)
-            }
-        else:
-            # Known reaction - use hardcoded rules as primary, LLM as fallback
-            final_triggers = {
-                "bubbles": triggers.get("bubbles", viz.get("bubbles", False)),
-                "precipitate": triggers.get("precipitate", viz.get("precipitate", False)),
-                "heat": triggers.get("heat", viz.get("heat", False)),
-                "color_change": triggers.get("color_change", viz.get("color_change", None)),
-                "gas_smoke": triggers.get("gas_smoke", viz.get("gas_smoke", False))
-            }
+        triggers = reaction_data.animation_triggers
+        rule_triggers = triggers if triggers is not None else {}
+        final_triggers = {
+            name: rule_triggers.get(name, viz.get(name, default))
+            for name, default in _TRIGGER_DEFAULTS.items()
+        }
 
         # Determine what particle effect to show
-        p_type = reaction_data.get("particle_type", "none")
+        p_type = reaction_data.particle_type
+        show_smoke = final_triggers["gas_smoke"]
 
         # If gas_smoke is detected, always show smoke effect with bubbles
-        if final_triggers.get("gas_smoke", False):
+        if show_smoke:
             # Override particle type for smoke/vapor visualization
             p_type = "smoke"
         elif p_type == "none":
             # Auto-select particle type based on other triggers
-            if final_triggers["bubbles"]:
-                p_type = "bubble"  # Gas being released
-            elif final_triggers["precipitate"]:
-                p_type = "precipitate"  # Solid forming
+            # (gas being released, then solid forming)
+            p_type = next(
+                (particle for name, particle in _PARTICLE_BY_TRIGGER if final_triggers[name]),
+                "none"
+            )
 
         # STEP 9: Build final response for frontend
 
         # For unknown reactions, update visual_effects based on LLM analysis
-        visual_effects = reaction_data.get("visual_effects", [])
-        if triggers is None and visual_effects == ["mixing_observed"]:
+        visual_effects = reaction_data.visual_effects
+        if triggers is None and visual_effects == ("mixing_observed",):
             # LLM detected something - update the visual effects description
-            detected_effects = []
-            if final_triggers["bubbles"]:
-                detected_effects.append("gas_evolution")
-            if final_triggers["gas_smoke"]:
-                detected_effects.append("visible_gas_smoke")
-            if final_triggers["precipitate"]:
-                detected_effects.append("precipitate_forming")
-            if final_triggers["heat"]:
-                detected_effects.append("heat_released")
-            if final_triggers["color_change"]:
-                detected_effects.append("color_change")
+            detected_effects = [effect for name, effect in _EFFECT_BY_TRIGGER if final_triggers[name]]
 
             if detected_effects:
                 visual_effects = detected_effects
 
         response = {
             # Chemical equation
-            "equation": viz.get("equation") if viz.get("equation") else reaction_data.get("equation", ""),
+            "equation": viz.get("equation") or reaction_data.equation,
 
-            # Final list of substances in the beaker
-            "products": list(set(current_substances)),
+            # Final list of substances in the beaker (already distinct)
+            "products": current_substances,
 
             # pH of the final mixture
-            "ph": reaction_data.get("ph_value", 7),
+            "ph": reaction_data.ph_value,
 
             # Observable changes (color, bubbles, heat, etc.)
             "symptoms": visual_effects,
 
             # Type of reaction (acid-base, synthesis, decomposition, etc.)
-            "reaction_type": reaction_data.get("reaction_type", "mixture"),
+            "reaction_type": reaction_data.reaction_type,
 
             # Visual triggers for animations
             "animation_triggers": final_triggers,
 
             # Color the liquid should turn
-            "liquidColor": final_triggers["color_change"] or reaction_data.get("liquid_color", "#FFFFFF33"),
+            "liquidColor": final_triggers["color_change"] or reaction_data.liquid_color,
 
             # Type of particles to show (bubbles, precipitate, smoke, etc.)
             "particleType": p_type,
 
             # Color of the particles/smoke
-            "particleColor": reaction_data.get("particle_color", "#FFFFFF"),
+            "particleColor": (reaction_data.particle_color or "#FFFFFF"),
 
             # Explicit smoke indicator for frontend
-            "showSmoke": final_triggers.get("gas_smoke", False),
+            "showSmoke": show_smoke,
 
             # Smoke color (if different from particle color)
-            "smokeColor": reaction_data.get("particle_color", "#E0E0E0") if final_triggers.get("gas_smoke", False) else None,
+            "smokeColor": (reaction_data.particle_color or "#E0E0E0") if show_smoke else None,
 
             # Steps for cascading animation
             "visual_steps": visual_steps,
@@ -4,7 +4,9 @@ Seeds 20 specific chemicals per category and discovers others.
 """
 
 import logging
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Import backend modules - handle both package and direct execution
 try:
@@ -71,9 +73,39 @@ CORE_CHEMICALS = {
     ]
 }
 
+# Lookups in flight at once; PubChemService still spaces the requests
+# themselves to PubChem's 5 requests/second policy
+SEED_WORKERS = 5
+
+def _fetch_core_chemical(pubchem, name):
+    """Look up one hardcoded chemical by name (None if it can't be fetched)."""
+    try:
+        return pubchem.get_chemical_by_name(name)
+    except Exception as e:
+        logger.error(f"  ✗ Error seeding {name}: {e}")
+        return None
+
+def _add_rows(db, rows, labels):
+    """
+    Insert seeded rows, one bad row not sinking the rest (see
+    Database.add_chemicals_with_fallback). Returns the number of rows inserted.
+    """
+    added, failures = db.add_chemicals_with_fallback(rows)
+    for row, e in failures:
+        logger.error(f"  ✗ Error saving {row['name']} (CID {row['cid']}): {e}")
+
+    # One line per chemical only when debugging; the summary below has the totals
+    if logger.isEnabledFor(logging.DEBUG):
+        failed = {row['cid'] for row, _ in failures}
+        for row, label in zip(rows, labels):
+            if row['cid'] not in failed:
+                logger.debug(f"  ✓ Added {label}")
+    return added
+
 def seed_database():
     db = Database()
-    pubchem = PubChemService()
+    # Seeding always keeps an on-disk lookup cache so re-runs are fast
+    pubchem = PubChemService(cache_path=os.getenv('PUBCHEM_CACHE_PATH', 'pubchem_cache.sqlite'))
     
     # Create tables if they don't exist
     db.create_tables()
@@ -84,60 +116,53 @@ def seed_database():
     
     total_added = 0
     total_skipped = 0
-    
-    for category, name_list in CORE_CHEMICALS.items():
-        logger.info(f"\n🌱 Seeding {category.upper()}...")
-        
-        # 1. Add Hardcoded 20
-        for name in name_list:
-            try:
-                chem_data = pubchem.get_chemical_by_name(name)
-                if not chem_data:
-                    continue
-                
-                if db.chemical_exists(chem_data['cid']):
-                    total_skipped += 1
-                    continue
-                
-                db.add_chemical(
-                    cid=chem_data['cid'],
-                    name=chem_data['name'],
-                    formula=chem_data['formula'],
-                    molecular_weight=chem_data.get('molecular_weight'),
-                    category=category,
-                    iupac_name=chem_data.get('iupac_name'),
-                    smiles=chem_data.get('smiles')
-                )
-                logger.info(f"  ✓ Added Hardcoded: {name}")
-                total_added += 1
-            except Exception as e:
-                logger.error(f"  ✗ Error seeding {name}: {e}")
-
-        # 2. Dynamic discovery for the category (to add "others")
+
+    # (category, chemical data, log label) in the order they should be added;
+    # if two entries share a CID the first one wins
+    candidates = []
+
+    # 1. Add Hardcoded 20 per category, looked up concurrently so network
+    # round-trips overlap instead of running one after another
+    pairs = [(category, name) for category, name_list in CORE_CHEMICALS.items() for name in name_list]
+    logger.info(f"\n🌱 Fetching {len(pairs)} hardcoded chemicals...")
+    with ThreadPoolExecutor(max_workers=SEED_WORKERS) as executor:
+        fetched = executor.map(lambda pair: _fetch_core_chemical(pubchem, pair[1]), pairs)
+        for (category, name), chem_data in zip(pairs, fetched):
+            if chem_data:
+                candidates.append((category, chem_data, f"Hardcoded: {name}"))
+
+    # 2. Dynamic discovery for each category (to add "others")
+    for category in CORE_CHEMICALS:
+        logger.info(f"\n🌱 Discovering {category.upper()}...")
         try:
             discovered_cids = pubchem.discover_chemicals_by_category_keywords(category, max_per_keyword=2)
-            for cid in discovered_cids:
-                if db.chemical_exists(cid):
-                    continue
-                
-                chem_data = pubchem.get_chemical_by_cid(cid)
-                if not chem_data:
-                    continue
-                
-                db.add_chemical(
-                    cid=chem_data['cid'],
-                    name=chem_data['name'],
-                    formula=chem_data['formula'],
-                    molecular_weight=chem_data.get('molecular_weight'),
-                    category=category,
-                    iupac_name=chem_data.get('iupac_name'),
-                    smiles=chem_data.get('smiles')
-                )
-                logger.info(f"  ✓ Added Discovered: {chem_data['name']}")
-                total_added += 1
+            for chem_data in pubchem.get_chemicals_by_cids(discovered_cids):
+                candidates.append((category, chem_data, f"Discovered: {chem_data['name']}"))
         except Exception as e:
             logger.error(f"Error discovering {category}: {e}")
 
+    # 3. Insert everything new in one transaction
+    seen = db.filter_existing_cids([chem_data['cid'] for _, chem_data, _ in candidates])
+    rows = []
+    labels = []
+    for category, chem_data, label in candidates:
+        if chem_data['cid'] in seen:
+            total_skipped += 1
+            continue
+        seen.add(chem_data['cid'])
+        rows.append({
+            'cid': chem_data['cid'],
+            'name': chem_data['name'],
+            'formula': chem_data['formula'],
+            'molecular_weight': chem_data.get('molecular_weight'),
+            'category': category,
+            'iupac_name': chem_data.get('iupac_name'),
+            'smiles': chem_data.get('smiles')
+        })
+        labels.append(label)
+
+    total_added = _add_rows(db, rows, labels)
+
     logger.info("\n" + "="*60)
     logger.info("SEEDING COMPLETE!")
     logger.info(f"  ✓ Total Added: {total_added}")
@@ -0,0 +1,57 @@
+"""
+Background Task Queue
+Runs slow admin operations (PubChem lookups, LLM categorization, database
+writes) outside the HTTP request so the web worker can answer immediately.
+
+Job state is stored in the database rather than in memory, so a client can
+poll any gunicorn worker for the outcome of a job started on another one.
+"""
+
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """Thread-pool task runner that records each job's status and result."""
+
+    def __init__(self, db, max_workers=None):
+        self.db = db
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("TASK_WORKERS", 4)),
+            thread_name_prefix="chemlab-task"
+        )
+
+    def enqueue(self, kind, func, *args):
+        """
+        Queue func(*args) to run in the background.
+
+        func must return a (result_dict, http_status) tuple, mirroring what
+        the synchronous endpoint would have responded with.
+
+        Returns:
+            str: Job ID to poll for the outcome
+        """
+        job_id = uuid.uuid4().hex
+        self.db.create_job(job_id, kind)
+        self.executor.submit(self._run, job_id, func, *args)
+        return job_id
+
+    def _run(self, job_id, func, *args):
+        """Execute a job and store its outcome."""
+        try:
+            self.db.update_job(job_id, 'running')
+            result, status_code = func(*args)
+            self.db.update_job(job_id, 'finished', status_code, result)
+        except Exception as e:
+            logger.error(f"Background job {job_id} failed: {e}")
+            try:
+                self.db.update_job(job_id, 'failed', 500, {
+                    "error": "The job failed. Please try again later."
+                })
+            except Exception as db_error:
+                logger.error(f"Could not record failure of job {job_id}: {db_error}")
@@ -37,6 +37,64 @@ class API {
         }
     }
 
+    /**
+     * Like react(), but over the streaming endpoint: onRules is called with the
+     * rule-based result as soon as it is known, onExplanation with each new
+     * piece of the AI explanation as it is written, and the promise resolves
+     * with the complete result once the whole answer has been generated.
+     */
+    static async reactStream(ingredients, temperature = 'room', concentration = 'dilute', onRules = null, onExplanation = null) {
+        try {
+            const response = await fetch(`${this.getBaseURL()}/api/react/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    ingredients,
+                    temperature,
+                    concentration
+                })
+            });
+            if (!response.ok || !response.body) {
+                return await this.react(ingredients, temperature, concentration);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Server-sent events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const message = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let event = 'message';
+                    let data = '';
+                    for (const line of message.split('\n')) {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    }
+
+                    if (event === 'rules' && onRules) {
+                        onRules(JSON.parse(data));
+                    } else if (event === 'explanation' && onExplanation) {
+                        onExplanation(JSON.parse(data).text);
+                    } else if (event === 'result' || event === 'error') {
+                        return JSON.parse(data);
+                    }
+                }
+            }
+            return null;
+        } catch (error) {
+            console.error('API Error:', error);
+            return null;
+        }
+    }
+
     static async getExplanation(reactionData) {
         try {
             const response = await fetch(`${this.getBaseURL()}/api/explain`, {
@@ -466,17 +466,7 @@ async function addIngredient(name, amount) {
         }
 
         // Predict what will happen when we mix the chemicals
-        const result = await API.react(ingredientsInBeaker, temperatureState, concentrationState);
-        if (result) {
-            reactionData = result;
-            updateUI(result);
-            if (result.visual_steps && result.visual_steps.length > 1) {
-                startReactionSequence(result.visual_steps);
-            } else {
-                phaseQueue = []; // Reset queue
-                applySymptoms(result);
-            }
-        }
+        await predictAndShow();
     } catch (error) {
         showStudentError('Something went wrong while mixing the chemicals. Please try again!');
         // Remove the last ingredient that caused the error
@@ -487,17 +477,48 @@ async function addIngredient(name, amount) {
 
 async function updateEnvironment() {
     if (ingredientsInBeaker.length > 0) {
-        const result = await API.react(ingredientsInBeaker, temperatureState, concentrationState);
-        if (result) {
-            reactionData = result;
-            updateUI(result);
-            if (result.visual_steps && result.visual_steps.length > 1) {
-                startReactionSequence(result.visual_steps);
-            } else {
-                phaseQueue = []; // Reset queue
-                applySymptoms(result);
-            }
-        }
+        await predictAndShow();
+    }
+}
+
+/**
+ * Ask the server what happens in the beaker and show it.
+ * The rule-based result animates the beaker straight away; the AI
+ * explanation is written into the details panel as it is generated.
+ */
+async function predictAndShow() {
+    let preview = null;
+    let explanation = '';
+    const explanationPanel = document.getElementById('ai-explanation');
+    const result = await API.reactStream(ingredientsInBeaker, temperatureState, concentrationState, (rules) => {
+        preview = rules;
+        showReaction(rules);
+        explanationPanel.innerText = 'Generating explanation...';
+    }, (text) => {
+        explanation += text;
+        explanationPanel.innerText = explanation;
+    });
+    if (!result) return;
+
+    // Only restart the animation if the AI changed what the beaker shows
+    // (reactions that aren't in the rules get their effects from the AI)
+    if (preview && JSON.stringify(preview.animation_triggers) === JSON.stringify(result.animation_triggers)
+        && preview.particleType === result.particleType && preview.liquidColor === result.liquidColor) {
+        reactionData = result;
+        updateUI(result);
+    } else {
+        showReaction(result);
+    }
+}
+
+function showReaction(result) {
+    reactionData = result;
+    updateUI(result);
+    if (result.visual_steps && result.visual_steps.length > 1) {
+        startReactionSequence(result.visual_steps);
+    } else {
+        phaseQueue = []; // Reset queue
+        applySymptoms(result);
     }
 }
 
@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for AI ChemLab.
+
+Request handlers spend most of their time waiting on PubChem, Groq and
+PostgreSQL, so each worker process runs several threads to keep serving
+other requests while one is blocked on network I/O.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Outbound LLM/PubChem calls can take several seconds
+timeout = 60
+keepalive = 5
@@ -3,11 +3,46 @@ Script to migrate chemicals from local database to Railway database.
 Run this script locally to copy all chemicals to Railway.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import sessionmaker
 from backend.database import Chemical, Base
 import os
 
+# Rows written per INSERT + COMMIT
+BATCH_SIZE = 500
+
+def _insert_batch(session, rows):
+    """
+    Insert a batch of chemical rows with one statement and one commit.
+    If the batch fails, retry it row by row so one bad row doesn't sink the rest.
+    Returns the number of rows inserted.
+    """
+    if not rows:
+        return 0
+
+    try:
+        session.execute(insert(Chemical), rows)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"✗ Batch of {len(rows)} failed ({e}), retrying one at a time")
+        inserted = 0
+        for row in rows:
+            try:
+                session.execute(insert(Chemical), [row])
+                session.commit()
+            except Exception as e:
+                print(f"✗ Error migrating {row['name']}: {e}")
+                session.rollback()
+                continue
+            print(f"✓ Migrated: {row['name']}")
+            inserted += 1
+        return inserted
+
+    for row in rows:
+        print(f"✓ Migrated: {row['name']}")
+    return len(rows)
+
 def migrate_chemicals(source_url, target_url):
     """Migrate chemicals from source to target database."""
 
@@ -33,36 +68,33 @@ def migrate_chemicals(source_url, target_url):
         migrated = 0
         skipped = 0
 
-        for chem in chemicals:
-            try:
-                # Check if chemical already exists in target
-                existing = target_session.query(Chemical).filter_by(cid=chem.cid).first()
-
-                if existing:
-                    print(f"Skipping {chem.name} (already exists)")
-                    skipped += 1
-                    continue
-
-                # Create new chemical in target database
-                new_chem = Chemical(
-                    cid=chem.cid,
-                    name=chem.name,
-                    formula=chem.formula,
-                    molecular_weight=chem.molecular_weight,
-                    category=chem.category,
-                    iupac_name=chem.iupac_name,
-                    smiles=chem.smiles
-                )
-
-                target_session.add(new_chem)
-                target_session.commit()
-
-                print(f"✓ Migrated: {chem.name}")
-                migrated += 1
+        # Fetch the target's CIDs once instead of querying per chemical
+        existing_cids = {cid for (cid,) in target_session.query(Chemical.cid)}
 
-            except Exception as e:
-                print(f"✗ Error migrating {chem.name}: {e}")
-                target_session.rollback()
+        pending = []
+        for chem in chemicals:
+            # Check if chemical already exists in target
+            if chem.cid in existing_cids:
+                print(f"Skipping {chem.name} (already exists)")
+                skipped += 1
+                continue
+
+            # Queue the chemical for the next batched insert
+            pending.append({
+                'cid': chem.cid,
+                'name': chem.name,
+                'formula': chem.formula,
+                'molecular_weight': chem.molecular_weight,
+                'category': chem.category,
+                'iupac_name': chem.iupac_name,
+                'smiles': chem.smiles
+            })
+
+            if len(pending) >= BATCH_SIZE:
+                migrated += _insert_batch(target_session, pending)
+                pending = []
+
+        migrated += _insert_batch(target_session, pending)
 
         print(f"\n✓ Migration complete!")
         print(f"  - Migrated: {migrated}")
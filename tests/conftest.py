@@ -0,0 +1,8 @@
+"""Shared test setup: a throwaway SQLite database for modules that connect at import."""
+
+import os
+import tempfile
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+os.environ.pop('GROQ_API_KEY', None)
+os.environ.pop('PUBCHEM_CACHE_PATH', None)
@@ -0,0 +1,46 @@
+"""Tests for the admin job bodies in app.py."""
+
+from backend import app as app_module
+
+
+def _chem(cid):
+    return {'cid': cid, 'name': f'Chemical {cid}', 'formula': 'X', 'molecular_weight': 1.0}
+
+
+def test_discover_keeps_good_rows_when_one_conflicts(monkeypatch):
+    db = app_module.db
+    db.create_tables()
+    db.add_chemicals_bulk([dict(_chem(9002), category='acids', iupac_name=None, smiles=None)])
+
+    cids = [9001, 9002, 9003]
+    monkeypatch.setattr(app_module.pubchem, 'discover_chemicals_by_category_keywords',
+                        lambda category, max_per_keyword: cids)
+    monkeypatch.setattr(app_module.pubchem, 'get_chemicals_by_cids',
+                        lambda new_cids: [_chem(cid) for cid in new_cids])
+    # Another worker inserted 9002 after this one checked for it
+    monkeypatch.setattr(db, 'filter_existing_cids', lambda cids: set())
+
+    result, status = app_module.discover_category_job('acids')
+
+    assert status == 200
+    assert result['added'] == 2
+    assert len(result['errors']) == 1
+    assert result['errors'][0].startswith('CID 9002:')
+    assert db.chemical_exists(9001) and db.chemical_exists(9003)
+
+
+def test_enqueue_failure_returns_json_error(monkeypatch):
+    def fail(job_id, kind):
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(app_module.db, 'create_job', fail)
+    client = app_module.app.test_client()
+
+    responses = [
+        client.post('/api/admin/add-chemical', json={'name': 'Water'}),
+        client.post('/api/admin/discover/acids'),
+    ]
+
+    for response in responses:
+        assert response.status_code == 500
+        assert 'error' in response.get_json()
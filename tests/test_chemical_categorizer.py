@@ -0,0 +1,44 @@
+"""Tests for the local (no-LLM) paths of ChemicalCategorizer."""
+
+import pytest
+
+from backend.chemical_categorizer import ChemicalCategorizer
+
+
+class _FailingClient:
+    """Stands in for the Groq client; any LLM call fails the test."""
+
+    @property
+    def chat(self):
+        raise AssertionError("the LLM should not be called for this chemical")
+
+
+@pytest.fixture
+def categorizer(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    return ChemicalCategorizer()
+
+
+@pytest.mark.parametrize("name, formula, expected", [
+    ("Acetic acid", "C2H4O2", "acids"),
+    ("Sodium hydroxide", "NaOH", "bases"),
+    ("Phenolphthalein", "C20H14O4", "indicators"),
+    ("Chlorine", "Cl2", "gases"),
+])
+def test_name_rules_skip_the_llm(categorizer, name, formula, expected):
+    categorizer.client = _FailingClient()
+    assert categorizer.categorize(name, formula) == expected
+
+
+def test_unmatched_name_uses_fallback_without_client(categorizer):
+    assert categorizer.categorize("Sodium chloride", "NaCl") == "salts"
+
+
+@pytest.mark.parametrize("name, formula", [
+    ("Hydroxide", "HO-"),
+    ("Carbonate ion", None),
+    ("Sodium acid pyrophosphate", "Na2H2P2O7"),
+    ("Acid Red 87", "C20H6Br4Na2O5"),
+])
+def test_name_rules_leave_ambiguous_names_to_the_llm(categorizer, name, formula):
+    assert categorizer._match_name_rules(name, formula) is None
@@ -0,0 +1,148 @@
+"""Tests for LLMService request batching, using a fake Groq client."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import orjson
+
+from backend.chemistry_rules import ChemistryRules
+from backend.llm_service import LLMService, _MicroBatcher
+
+CONTENT = {
+    "explanation": "Acid meets base.",
+    "safety_tips": "Wear goggles.",
+    "concept": "Neutralization",
+    "real_world_example": "Antacids",
+    "visual_metadata": {}
+}
+
+
+def _tool_response(arguments):
+    call = SimpleNamespace(function=SimpleNamespace(arguments=orjson.dumps(arguments).decode()))
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[call]))])
+
+
+class FakeGroq:
+    """Records every create() call; batch calls fail when fail_batches is set."""
+
+    def __init__(self, fail_batches=False):
+        self.calls = []
+        self.fail_batches = fail_batches
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        batch = kwargs["tool_choice"]["function"]["name"] == "emit_batch_content"
+        with self._lock:
+            self.calls.append((batch, threading.current_thread().name, kwargs["max_tokens"]))
+        if batch:
+            if self.fail_batches:
+                raise RuntimeError("batch failed")
+            count = kwargs["messages"][1]["content"].count("REACTION ")
+            return _tool_response({"results": [dict(CONTENT, idx=i) for i in range(count)]})
+        return _tool_response(CONTENT)
+
+
+def _service(monkeypatch, client, window_ms=200):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    service = LLMService()
+    service.client = client
+    service.model_name = "test-model"
+    service._batcher = _MicroBatcher(service._generate_batch, window_ms / 1000, service.MAX_BATCH)
+    return service
+
+
+def _run_concurrently(service, count):
+    reaction = ChemistryRules().predict_reaction(["hydrochloric acid", "sodium hydroxide"])
+    results = {}
+
+    def worker(i):
+        results[i] = service.generate_educational_content(reaction, ["hydrochloric acid", f"sample {i}"])
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"caller-{i}") for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_full_batch_runs_without_waiting_for_the_window():
+    seen = []
+    batcher = _MicroBatcher(lambda items: seen.append(list(items)) or items, window=5, max_batch=2)
+    results = {}
+
+    def submit(i):
+        results[i] = batcher.submit(i)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 1
+    assert results == {0: 0, 1: 1}
+    assert seen == [[0, 1]]
+
+
+def test_batches_are_split_at_max_batch_and_tokens_capped(monkeypatch):
+    client = FakeGroq()
+    service = _service(monkeypatch, client)
+    monkeypatch.setattr(LLMService, "MAX_BATCH", 3)
+    monkeypatch.setattr(LLMService, "MAX_BATCH_TOKENS", 1000)
+    service._batcher = _MicroBatcher(service._generate_batch, 0.2, service.MAX_BATCH)
+
+    results = _run_concurrently(service, 7)
+
+    assert all(result["explanation"] == CONTENT["explanation"] for result in results.values())
+    batch_calls = [call for call in client.calls if call[0]]
+    assert len(batch_calls) >= 2
+    assert all(max_tokens <= 1000 for _, _, max_tokens in batch_calls)
+
+
+def test_failed_batch_falls_back_on_each_callers_thread(monkeypatch):
+    client = FakeGroq(fail_batches=True)
+    service = _service(monkeypatch, client)
+
+    results = _run_concurrently(service, 4)
+
+    assert all(result["explanation"] == CONTENT["explanation"] for result in results.values())
+    single_threads = sorted(thread for batch, thread, _ in client.calls if not batch)
+    assert single_threads == [f"caller-{i}" for i in range(4)]
+
+
+class FakeStreamingGroq:
+    """Streams a plain-content reply a few characters at a time."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.reply[i:i + 3]))])
+            for i in range(0, len(self.reply), 3)
+        )
+
+
+def test_stream_yields_explanation_text_as_it_arrives(monkeypatch):
+    content = dict(CONTENT, explanation='Acid meets base.\nWater "forms" — quickly.')
+    reply = "```json\n" + orjson.dumps(content).decode() + "\n```"
+    client = FakeStreamingGroq(reply)
+    service = _service(monkeypatch, client)
+    service._batcher = None
+    reaction = ChemistryRules().predict_reaction(["hydrochloric acid", "sodium hydroxide"])
+
+    events = list(service.stream_educational_content(reaction, ["hydrochloric acid", "sodium hydroxide"]))
+
+    pieces = [text for kind, text in events if kind == "explanation"]
+    assert len(pieces) > 1
+    assert "".join(pieces) == content["explanation"]
+    assert events[-1] == ("content", service._to_educational_content(content))
+    # Plain content is streamed; no forced function call
+    assert "tools" not in client.requests[0] and client.requests[0]["stream"] is True
@@ -0,0 +1,67 @@
+"""Tests for PubChemService's PUG REST parsing, using a recorded-style response."""
+
+import copy
+import json
+import os
+
+import pytest
+
+from backend.pubchem_service import PubChemService
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'pubchem_properties.json')
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+
+
+@pytest.fixture
+def properties():
+    with open(FIXTURE_PATH, encoding='utf-8') as fixture:
+        return json.load(fixture)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.delenv('PUBCHEM_CACHE_PATH', raising=False)
+    service = PubChemService()
+    monkeypatch.setattr(service, '_rate_limit', lambda: None)
+    return service
+
+
+def test_name_lookup_reads_connectivity_smiles(service, properties, monkeypatch):
+    requested = []
+    water = {'PropertyTable': {'Properties': properties['PropertyTable']['Properties'][:1]}}
+
+    def get(url, timeout):
+        requested.append(url)
+        return FakeResponse(water)
+
+    monkeypatch.setattr(service.session, 'get', get)
+
+    chem = service.get_chemical_by_name('Water')
+
+    assert 'ConnectivitySMILES' in requested[0]
+    assert chem['cid'] == 962
+    assert chem['smiles'] == 'O'
+
+
+def test_batch_lookup_reads_connectivity_smiles(service, properties, monkeypatch):
+    monkeypatch.setattr(service.session, 'post', lambda url, data, timeout: FakeResponse(properties))
+
+    chems = service.get_chemicals_by_cids([962, 1118])
+
+    assert [chem['smiles'] for chem in chems] == ['O', 'OS(=O)(=O)O']
+
+
+def test_legacy_canonical_smiles_key_still_read(service, properties, monkeypatch):
+    legacy = copy.deepcopy(properties)
+    for record in legacy['PropertyTable']['Properties']:
+        record['CanonicalSMILES'] = record.pop('ConnectivitySMILES')
+    monkeypatch.setattr(service.session, 'post', lambda url, data, timeout: FakeResponse(legacy))
+
+    chems = service.get_chemicals_by_cids([962, 1118])
+
+    assert [chem['smiles'] for chem in chems] == ['O', 'OS(=O)(=O)O']